@@ -0,0 +1,243 @@
+"""Load test for the Economy cog.
+
+Drives the command callbacks (work, crime, rob, buy, claim, balance) with fake
+contexts against a throwaway economy.db and reports throughput, latency
+percentiles, lock wait time and SQLite commit counts.
+
+    python -m benchmarks.economy --users 2000 --ops 10
+    python -m benchmarks.economy --max-p99 50 --min-throughput 2000   # exit 1 on regression
+
+Any command raising also exits 1, after printing the first traceback.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+import types
+
+from settings import utils
+from settings.utils import KeyedLock
+from cogs.economy import Economy
+
+GUILD_ID = 1
+INCOME_ROLE_ID = 2
+COMMAND_MIX = {
+    "work": 35,
+    "crime": 20,
+    "balance": 20,
+    "buy": 10,
+    "rob": 10,
+    "claim": 5,
+}
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.default_role = FakeRole(guild_id, "@everyone")
+
+
+class FakeMember:
+    def __init__(self, guild: FakeGuild, user_id: int, roles=()):
+        self.guild = guild
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.roles = [guild.default_role, *roles]
+
+
+class FakeContext:
+    def __init__(self, author: FakeMember):
+        self.author = author
+        self.guild = author.guild
+
+    async def send(self, *args, **kwargs):
+        pass
+
+    async def reply(self, *args, **kwargs):
+        pass
+
+    async def defer(self, *args, **kwargs):
+        pass
+
+
+class TimedLock(asyncio.Lock):
+    """asyncio.Lock that adds the time spent waiting for it to ``stats``."""
+
+    def __init__(self, stats: dict):
+        super().__init__()
+        self.stats = stats
+
+    async def acquire(self):
+        start = time.perf_counter()
+        await super().acquire()
+        self.stats["lock_wait"] += time.perf_counter() - start
+        self.stats["lock_acquisitions"] += 1
+        return True
+
+
+class CommitCounter:
+    """SQLite trace callback counting commits, explicit or autocommit."""
+
+    def __init__(self):
+        self.commits = 0
+        self.in_transaction = False
+
+    def __call__(self, sql: str):
+        statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if statement == "BEGIN":
+            self.in_transaction = True
+        elif statement in ("COMMIT", "END"):
+            self.in_transaction = False
+            self.commits += 1
+        elif statement == "ROLLBACK":
+            self.in_transaction = False
+        elif statement in ("INSERT", "UPDATE", "DELETE", "REPLACE") and not self.in_transaction:
+            self.commits += 1
+
+
+def percentile(samples: list, pct: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def run(args) -> dict:
+    await utils.init_economy_db()
+    stats = {"lock_wait": 0.0, "lock_acquisitions": 0}
+    cog = Economy(types.SimpleNamespace())
+    cog.user_locks = KeyedLock()
+    cog.user_locks._locks = [TimedLock(stats) for _ in cog.user_locks._locks]
+    await cog.cog_load()
+
+    guild = FakeGuild(GUILD_ID)
+    economy = await cog.guild_economy(GUILD_ID)
+    economy.db.write_lock = TimedLock(stats)
+    counter = CommitCounter()
+    await economy.db.writer.set_trace_callback(counter)
+
+    await economy.catalog.upsert("jobs", "developer", 50, 150)
+    await economy.catalog.upsert("robberies", "bank", 50.0, 100, 400)
+    await economy.catalog.upsert("items", "apple", 5)
+    await economy.catalog.upsert("role_income", INCOME_ROLE_ID, 250)
+    income_role = FakeRole(INCOME_ROLE_ID, "income")
+    members = [
+        FakeMember(guild, 1000 + i, [income_role] if i % 4 == 0 else [])
+        for i in range(args.users)
+    ]
+    for member in members:
+        economy.ledger.add(member.id, 1000)
+    await economy.ledger.flush()
+    counter.commits = 0
+    stats.update(lock_wait=0.0, lock_acquisitions=0)
+
+    commands_by_name = {name: getattr(cog, name) for name in COMMAND_MIX}
+    names = list(COMMAND_MIX)
+    weights = list(COMMAND_MIX.values())
+    latencies = {name: [] for name in names}
+    errors = 0
+    first_error = None
+    limit = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+
+    async def simulate(member: FakeMember):
+        nonlocal errors, first_error
+        for _ in range(args.ops):
+            name = rng.choices(names, weights)[0]
+            extra = ()
+            if name == "rob":
+                extra = (rng.choice(members),)
+            elif name == "buy":
+                extra = ("apple", rng.randint(1, 3))
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    await commands_by_name[name].callback(cog, FakeContext(member), *extra)
+                except Exception:
+                    errors += 1
+                    if first_error is None:
+                        first_error = f"{name}:\n{traceback.format_exc()}"
+                latencies[name].append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(member) for member in members))
+    elapsed = time.perf_counter() - started
+    await cog.cog_unload()
+
+    return {
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "errors": errors,
+        "first_error": first_error,
+        "commits": counter.commits,
+        **stats,
+    }
+
+
+def report(result: dict) -> tuple:
+    all_samples = sorted(sample for samples in result["latencies"].values() for sample in samples)
+    total = len(all_samples)
+    throughput = total / result["elapsed"]
+    print(f"{total:,} commands in {result['elapsed']:.2f}s ({throughput:,.0f} cmd/s), {result['errors']} errors")
+    print(f"{'command':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, samples in result["latencies"].items():
+        if not samples:
+            continue
+        samples.sort()
+        print(
+            f"{name:<10}{len(samples):>8}{percentile(samples, 50) * 1000:>10.2f}"
+            f"{percentile(samples, 95) * 1000:>10.2f}{percentile(samples, 99) * 1000:>10.2f}"
+        )
+    p99 = percentile(all_samples, 99) * 1000
+    print(
+        f"{'all':<10}{total:>8}{percentile(all_samples, 50) * 1000:>10.2f}"
+        f"{percentile(all_samples, 95) * 1000:>10.2f}{p99:>10.2f}"
+    )
+    waits = result["lock_acquisitions"] or 1
+    print(f"lock wait: {result['lock_wait']:.3f}s total, {result['lock_wait'] / waits * 1000:.3f}ms mean over {result['lock_acquisitions']:,} acquisitions")
+    print(f"sqlite commits: {result['commits']:,} ({result['commits'] / total:.3f} per command)")
+    print(f"mean latency: {statistics.fmean(all_samples) * 1000:.2f}ms")
+    return throughput, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="simulated users")
+    parser.add_argument("--ops", type=int, default=10, help="commands per user")
+    parser.add_argument("--concurrency", type=int, default=500, help="commands in flight at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-p99", type=float, help="fail if overall p99 latency (ms) is above this")
+    parser.add_argument("--min-throughput", type=float, help="fail if throughput (cmd/s) is below this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        result = asyncio.run(run(args))
+        throughput, p99 = report(result)
+
+    failed = False
+    if result["errors"]:
+        print(f"FAIL: {result['errors']} commands raised; first was {result['first_error']}")
+        failed = True
+    if args.max_p99 is not None and p99 > args.max_p99:
+        print(f"FAIL: p99 {p99:.2f}ms is above {args.max_p99}ms")
+        failed = True
+    if args.min_throughput is not None and throughput < args.min_throughput:
+        print(f"FAIL: throughput {throughput:,.0f} cmd/s is below {args.min_throughput:,.0f}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,533 @@
 import discord
-from discord.ext import commands
-import aiosqlite
+from discord.ext import commands, tasks
 import random
-from datetime import datetime, timedelta, timezone
 import asyncio
+import contextlib
+import csv
+import json
+import logging
+import os
+import tempfile
+from itertools import islice
+from typing import Literal
+import aiohttp
+import settings
+from settings.database import Database
+from settings.migrations import migrate, ECONOMY_MIGRATIONS
+from settings.utils import KeyedLock, now_epoch
+from settings.views import Paginator
+
+log = logging.getLogger(__name__)
+
+ADD_BALANCE = (
+    "INSERT INTO users (guild_id, user_id, balance) VALUES (?, ?, ?) "
+    "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + excluded.balance"
+)
+SPEND_BALANCE = "UPDATE users SET balance = balance - ? WHERE guild_id = ? AND user_id = ? AND balance + ? >= ?"
+GET_BALANCE = "SELECT balance FROM users WHERE guild_id = ? AND user_id = ?"
+TOP_BALANCES = "SELECT user_id, balance FROM users WHERE guild_id = ? ORDER BY balance DESC, user_id DESC LIMIT ?"
+BALANCES_AFTER = (
+    "SELECT user_id, balance FROM users WHERE guild_id = ? AND (balance < ? OR (balance = ? AND user_id < ?)) "
+    "ORDER BY balance DESC, user_id DESC LIMIT ?"
+)
+LEADERBOARD_PAGE_SIZE = 10
+# Per-guild database files unused for this long are flushed and closed.
+IDLE_DATABASE_SECONDS = 15 * 60
+CLAIM_COOLDOWN = 24 * 60 * 60
+CLAIM_INCOME = (
+    "INSERT INTO last_claims (guild_id, user_id, last_claim) VALUES (?, ?, ?) "
+    "ON CONFLICT(guild_id, user_id) DO UPDATE SET last_claim = excluded.last_claim "
+    "WHERE last_claims.last_claim IS NULL OR last_claims.last_claim <= excluded.last_claim - ?"
+)
+
+class TopBalances:
+    """The ``capacity`` highest balances, kept current as balances change.
+
+    Members track their exact balance through every delta. Anyone else joins
+    when a ledger flush reports a balance above the lowest member. If a
+    member falls below that floor, someone outside might now outrank them, so
+    the set is marked stale and reloaded from the balance index on next read.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.balances: dict[int, int] = {}
+        self.stale = True
+
+    def _floor(self):
+        if len(self.balances) < self.capacity:
+            return None
+        return min(self.balances.values())
+
+    def load(self, rows):
+        self.balances = dict(rows)
+        self.stale = False
+
+    def apply(self, user_id: int, amount: int):
+        if user_id not in self.balances:
+            return
+        floor = self._floor()
+        self.balances[user_id] += amount
+        if floor is not None and self.balances[user_id] < floor:
+            self.stale = True
+
+    def offer(self, user_id: int, balance: int):
+        if user_id in self.balances:
+            self.apply(user_id, balance - self.balances[user_id])
+            return
+        floor = self._floor()
+        if floor is None:
+            self.balances[user_id] = balance
+        elif balance > floor:
+            del self.balances[min(self.balances, key=lambda member: (self.balances[member], member))]
+            self.balances[user_id] = balance
+
+    def ranked(self) -> list:
+        return sorted(self.balances.items(), key=lambda entry: (entry[1], entry[0]), reverse=True)
+
+class BalanceLedger:
+    """Write-behind buffer of one guild's balance deltas in front of the ``users`` table.
+
+    Deltas are coalesced per user and written in one transaction whenever the
+    cog's flush loop runs, or as soon as ``max_events`` deltas are buffered.
+    ``balance()`` always includes deltas that haven't reached the disk yet.
+    """
+
+    def __init__(self, db: Database, guild_id: int, max_events: int = 500):
+        self.db = db
+        self.guild_id = guild_id
+        self.max_events = max_events
+        self.pending: dict[int, int] = {}
+        self.inflight: dict[int, int] = {}
+        self.top = TopBalances()
+        self._spent: list = []
+        self.events = 0
+        self.flushes = 0
+        self.lock = asyncio.Lock()
+        self._flush_task = None
+
+    def add(self, user_id: int, amount: int):
+        self.pending[user_id] = self.pending.get(user_id, 0) + amount
+        self.top.apply(user_id, amount)
+        self.events += 1
+        if self.events >= self.max_events and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_logged())
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("Failed to flush balance ledger for guild %s", self.guild_id)
+
+    async def balance(self, user_id: int) -> int:
+        while True:
+            if user_id in self.inflight:
+                async with self.lock:
+                    pass
+            flushes = self.flushes
+            row = await self.db.fetchone(GET_BALANCE, (self.guild_id, user_id))
+            # Retry if a flush picked up deltas while we were reading, since the
+            # row may or may not include them.
+            if flushes == self.flushes and user_id not in self.inflight:
+                return (row[0] if row else 0) + self.pending.get(user_id, 0)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """A write transaction that no flush can interleave with."""
+        async with self.lock:
+            self._spent = []
+            async with self.db.transaction() as db:
+                yield db
+            for user_id, amount in self._spent:
+                self.top.apply(user_id, -amount)
+
+    async def spend(self, db, user_id: int, amount: int) -> bool:
+        """Debit ``amount`` inside ``transaction()`` only if the user can afford it,
+        counting unflushed deltas. Returns whether it was taken."""
+        await db.execute("INSERT OR IGNORE INTO users (guild_id, user_id, balance) VALUES (?, ?, 0)", (self.guild_id, user_id))
+        async with db.execute(SPEND_BALANCE, (amount, self.guild_id, user_id, self.pending.get(user_id, 0), amount)) as cursor:
+            spent = cursor.rowcount > 0
+        if spent:
+            self._spent.append((user_id, amount))
+        return spent
+
+    async def ranked(self) -> list:
+        """The cached top balances, best first, reloading them if stale."""
+        if self.top.stale:
+            async with self.lock:
+                rows = await self.db.fetchall(TOP_BALANCES, (self.guild_id, self.top.capacity))
+                self.top.load((user_id, balance + self.pending.get(user_id, 0)) for user_id, balance in rows)
+        return self.top.ranked()
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            batch = self.inflight = self.pending
+            self.pending, self.events = {}, 0
+            self.flushes += 1
+            try:
+                async with self.db.transaction() as db:
+                    await db.executemany(ADD_BALANCE, ((self.guild_id, user_id, amount) for user_id, amount in batch.items()))
+            except BaseException:
+                for user_id, amount in batch.items():
+                    self.pending[user_id] = self.pending.get(user_id, 0) + amount
+                raise
+            finally:
+                self.inflight = {}
+            await self._offer_top(list(batch))
+
+    async def _offer_top(self, user_ids: list):
+        if self.top.stale:
+            return
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            rows = await self.db.fetchall(
+                f"SELECT user_id, balance FROM users WHERE guild_id = ? AND user_id IN ({', '.join('?' * len(chunk))})",
+                (self.guild_id, *chunk)
+            )
+            for user_id, balance in rows:
+                self.top.offer(user_id, balance + self.pending.get(user_id, 0))
+
+CATALOG_TABLES = {
+    "jobs": ("name", "payout_min", "payout_max"),
+    "items": ("name", "price"),
+    "robberies": ("name", "success_chance", "reward_min", "reward_max"),
+    "role_income": ("role_id", "income_amount"),
+}
+
+class Catalog:
+    """In-memory copy of one guild's rows from the admin-managed tables in ``CATALOG_TABLES``.
+
+    Loaded once, then kept in step by ``upsert``/``remove``, which write the
+    row and swap in a new snapshot of that table. Readers never see a
+    half-applied change, and ``version`` goes up on every change.
+    """
+
+    def __init__(self, db: Database, guild_id: int):
+        self.db = db
+        self.guild_id = guild_id
+        self.version = 0
+        self.tables: dict[str, dict] = {table: {} for table in CATALOG_TABLES}
+        self._rows: dict[str, tuple] = {table: () for table in CATALOG_TABLES}
+        self.lock = asyncio.Lock()
+
+    async def load(self):
+        for table, columns in CATALOG_TABLES.items():
+            rows = await self.db.fetchall(f"SELECT {', '.join(columns)} FROM {table} WHERE guild_id = ?", (self.guild_id,))
+            self._publish(table, {row[0]: tuple(row) for row in rows})
+
+    def _publish(self, table: str, rows: dict):
+        self.tables[table] = rows
+        self._rows[table] = tuple(rows.values())
+        self.version += 1
+
+    def rows(self, table: str) -> tuple:
+        return self._rows[table]
+
+    def get(self, table: str, key):
+        return self.tables[table].get(key)
+
+    async def upsert(self, table: str, *row):
+        columns = CATALOG_TABLES[table]
+        async with self.lock:
+            await self.db.execute(
+                f"INSERT OR REPLACE INTO {table} (guild_id, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+                (self.guild_id, *row)
+            )
+            self._publish(table, {**self.tables[table], row[0]: row})
+
+    async def remove(self, table: str, key) -> bool:
+        async with self.lock:
+            removed = await self.db.execute(f"DELETE FROM {table} WHERE guild_id = ? AND {CATALOG_TABLES[table][0]} = ?", (self.guild_id, key))
+            if key in self.tables[table]:
+                rows = dict(self.tables[table])
+                del rows[key]
+                self._publish(table, rows)
+            return removed > 0
+
+BULK_TABLES = {**CATALOG_TABLES, "users": ("user_id", "balance")}
+BULK_CHUNK_SIZE = 500
+
+def bulk_row(table: str, record: dict, line: int) -> tuple:
+    if not isinstance(record, dict):
+        raise ValueError(f"row {line} is not an object: {record!r:.50}")
+    row = []
+    for column in BULK_TABLES[table]:
+        if column not in record:
+            raise ValueError(f"row {line} is missing `{column}`")
+        value = record[column]
+        try:
+            if column == "name":
+                row.append(str(value).lower() if table == "items" else str(value))
+            elif column == "success_chance":
+                row.append(float(value))
+            else:
+                row.append(int(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"row {line} has an invalid `{column}`: {value!r}")
+    return tuple(row)
+
+async def read_records(attachment: discord.Attachment):
+    """Yield one dict per row of a CSV (with a header row) or JSON Lines attachment,
+    downloading it line by line instead of all at once."""
+    is_csv = attachment.filename.lower().endswith(".csv")
+    header = None
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for raw in response.content:
+                line = raw.decode("utf-8-sig").strip()
+                if not line:
+                    continue
+                if not is_csv:
+                    yield json.loads(line)
+                    continue
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [value.strip() for value in values]
+                else:
+                    yield dict(zip(header, values))
+
+class GuildEconomy:
+    """Everything one guild's economy needs: its database, ledger and catalog."""
+
+    def __init__(self, db: Database, guild_id: int):
+        self.db = db
+        self.guild_id = guild_id
+        self.ledger = BalanceLedger(db, guild_id)
+        self.catalog = Catalog(db, guild_id)
+
+    async def _stage_rows(self, table: str, records, out) -> int:
+        """Validate every record and write it to ``out`` as one JSON array per line."""
+        count = 0
+        async for record in records:
+            count += 1
+            out.write(json.dumps(bulk_row(table, record, count)) + "\n")
+        return count
+
+    async def _insert_batches(self, db, table: str, staged) -> int:
+        columns = BULK_TABLES[table]
+        sql = f"INSERT OR REPLACE INTO {table} (guild_id, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})"
+        count = 0
+        while lines := list(islice(staged, BULK_CHUNK_SIZE)):
+            await db.executemany(sql, [(self.guild_id, *json.loads(line)) for line in lines])
+            count += len(lines)
+        return count
+
+    async def import_rows(self, table: str, records) -> int:
+        """Upsert every record in one transaction, ``BULK_CHUNK_SIZE`` rows per executemany.
+
+        The records are downloaded and validated into a temporary file first, so
+        the write lock, which every guild in economy.db shares, is only held while
+        local rows go in. Nothing is written if any row is invalid.
+        """
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as staged:
+            await self._stage_rows(table, records, staged)
+            staged.seek(0)
+            if table == "users":
+                await self.ledger.flush()
+                async with self.ledger.transaction() as db:
+                    count = await self._insert_batches(db, table, staged)
+                self.ledger.top.stale = True
+                return count
+            async with self.catalog.lock:
+                async with self.db.transaction() as db:
+                    count = await self._insert_batches(db, table, staged)
+                await self.catalog.load()
+            return count
+
+    async def export_rows(self, table: str, out, file_type: str) -> int:
+        """Write the guild's rows to ``out`` as CSV or JSON Lines, ``BULK_CHUNK_SIZE`` rows at a time."""
+        if table == "users":
+            await self.ledger.flush()
+        columns = BULK_TABLES[table]
+        writer = csv.writer(out) if file_type == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        count = 0
+        async with self.db.read() as conn:
+            async with conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE guild_id = ?", (self.guild_id,)) as cursor:
+                while rows := await cursor.fetchmany(BULK_CHUNK_SIZE):
+                    if writer:
+                        writer.writerows(rows)
+                    else:
+                        out.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+                    count += len(rows)
+        return count
+
+async def leaderboard_page(economy: GuildEconomy, offset: int, after=None) -> list:
+    """Up to ``LEADERBOARD_PAGE_SIZE + 1`` ``(user_id, balance)`` rows starting at rank ``offset + 1``.
+
+    The extra row only shows that another page exists. Pages inside the cached
+    top balances never touch SQLite; past them, rows are read from the balance
+    index, keyset-paginated after the last row of the previous page.
+    """
+    ledger = economy.ledger
+    ranked = await ledger.ranked()
+    if after is None or offset + LEADERBOARD_PAGE_SIZE < len(ranked) or len(ranked) < ledger.top.capacity:
+        return ranked[offset:offset + LEADERBOARD_PAGE_SIZE + 1]
+    await ledger.flush()
+    user_id, balance = after
+    return await economy.db.fetchall(BALANCES_AFTER, (economy.guild_id, balance, balance, user_id, LEADERBOARD_PAGE_SIZE + 1))
+
+def leaderboard_embed(rows: list, page: int) -> discord.Embed:
+    lines = [
+        f"**{rank}.** <@{user_id}> — ${balance:,}"
+        for rank, (user_id, balance) in enumerate(rows, start=page * LEADERBOARD_PAGE_SIZE + 1)
+    ]
+    embed = discord.Embed(title="🏆 Leaderboard", description="\n".join(lines) or "Nobody has any money yet.", color=discord.Color.gold())
+    embed.set_footer(text=f"Page {page + 1}")
+    return embed
 
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_lock = asyncio.Lock()
-
-    async def get_balance(self, user_id: int):
-        async with aiosqlite.connect("economy.db", timeout=10) as db:
-            await db.execute("INSERT OR IGNORE INTO users (user_id, balance) VALUES (?, ?)", (user_id, 0))
-            await db.commit()
-            async with db.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0]
-
-    async def update_balance(self, user_id: int, amount: int, db=None):
-        if db is None:
-            async with aiosqlite.connect("economy.db", timeout=10) as new_db:
-                await new_db.execute("INSERT OR IGNORE INTO users (user_id, balance) VALUES (?, ?)", (user_id, 0))
-                await new_db.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
-                await new_db.commit()
-        else:
-            await db.execute("INSERT OR IGNORE INTO users (user_id, balance) VALUES (?, ?)", (user_id, 0))
-            await db.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
+        self.user_locks = KeyedLock()
+        self.databases: dict[str, Database] = {}
+        self.guilds: dict[int, GuildEconomy] = {}
+        self.last_used: dict[int, float] = {}
+        self._open_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.flush_ledgers.start()
+        self.close_idle_databases.start()
+
+    async def cog_unload(self):
+        self.flush_ledgers.cancel()
+        self.close_idle_databases.cancel()
+        for economy in self.guilds.values():
+            await economy.ledger.flush()
+        for db in self.databases.values():
+            await db.close()
+
+    async def cog_check(self, ctx):
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        return True
+
+    def database_path(self, guild_id: int) -> str:
+        """economy.db, or one file per guild when ECONOMY_DB_PER_GUILD is set.
+
+        The guild that owns the pre-partitioning data keeps using economy.db.
+        """
+        if not settings.ECONOMY_DB_PER_GUILD or guild_id == settings.ECONOMY_LEGACY_GUILD_ID:
+            return "economy.db"
+        return os.path.join("economy", f"{guild_id}.db")
+
+    async def guild_economy(self, guild_id: int) -> GuildEconomy:
+        self.last_used[guild_id] = asyncio.get_running_loop().time()
+        economy = self.guilds.get(guild_id)
+        if economy is not None:
+            return economy
+        async with self._open_lock:
+            if guild_id in self.guilds:
+                return self.guilds[guild_id]
+            path = self.database_path(guild_id)
+            db = self.databases.get(path)
+            if db is None:
+                if path != "economy.db":
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    await migrate(path, ECONOMY_MIGRATIONS)
+                db = Database(path, readers=4 if path == "economy.db" else 2)
+                await db.open()
+                self.databases[path] = db
+            economy = GuildEconomy(db, guild_id)
+            await economy.catalog.load()
+            self.guilds[guild_id] = economy
+            return economy
+
+    async def get_balance(self, guild_id: int, user_id: int):
+        economy = await self.guild_economy(guild_id)
+        return await economy.ledger.balance(user_id)
+
+    @tasks.loop(seconds=0.5)
+    async def flush_ledgers(self):
+        for economy in list(self.guilds.values()):
+            try:
+                await economy.ledger.flush()
+            except Exception:
+                log.exception("Failed to flush balance ledger for guild %s", economy.guild_id)
+
+    @tasks.loop(minutes=1)
+    async def close_idle_databases(self):
+        """Close per-guild database files that have not been used for IDLE_DATABASE_SECONDS.
+
+        The ledger is flushed first and the guild is kept open if that fails or if
+        it was used again while flushing. economy.db is shared and never closed.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._open_lock:
+            for guild_id, economy in list(self.guilds.items()):
+                if economy.db.path == "economy.db" or loop.time() - self.last_used.get(guild_id, 0) < IDLE_DATABASE_SECONDS:
+                    continue
+                try:
+                    await economy.ledger.flush()
+                except Exception:
+                    log.exception("Failed to flush balance ledger for guild %s", guild_id)
+                    continue
+                if economy.ledger.pending or loop.time() - self.last_used.get(guild_id, 0) < IDLE_DATABASE_SECONDS:
+                    continue
+                del self.guilds[guild_id]
+                self.last_used.pop(guild_id, None)
+                await self.databases.pop(economy.db.path).close()
 
     @commands.hybrid_command(name="balance", description="Check your balance.")
     async def balance(self, ctx):
-        balance = await self.get_balance(ctx.author.id)
+        balance = await self.get_balance(ctx.guild.id, ctx.author.id)
         await ctx.send(f"💰 {ctx.author.mention}, you have **${balance:,}**")
 
+    @commands.hybrid_command(name="leaderboard", description="See the richest users.")
+    async def leaderboard(self, ctx):
+        economy = await self.guild_economy(ctx.guild.id)
+
+        async def fetch(page, previous):
+            return await leaderboard_page(economy, page * LEADERBOARD_PAGE_SIZE, previous[-1] if previous else None)
+
+        view = await Paginator(ctx.author.id, LEADERBOARD_PAGE_SIZE, fetch, leaderboard_embed, timeout=120).start()
+        await ctx.send(embed=view.embed(), view=view)
+
     @commands.hybrid_command(name="work", description="Work a job for money.")
     async def work(self, ctx):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                async with db.execute("SELECT name, payout_min, payout_max FROM jobs") as cursor:
-                    jobs = await cursor.fetchall()
-                    if not jobs:
-                        return await ctx.send("No jobs available. Ask an admin to add some using `/addjob`.")
-                    job = random.choice(jobs)
-                    payout = random.randint(job[1], job[2])
-                    await self.update_balance(ctx.author.id, payout, db)
-                    await db.commit()
-                    await ctx.send(f"🛠️ You worked as a **{job[0]}** and earned **${payout:,}**!")
+        economy = await self.guild_economy(ctx.guild.id)
+        jobs = economy.catalog.rows("jobs")
+        if not jobs:
+            return await ctx.send("No jobs available. Ask an admin to add some using `/addjob`.")
+        job = random.choice(jobs)
+        payout = random.randint(job[1], job[2])
+        economy.ledger.add(ctx.author.id, payout)
+        await ctx.send(f"🛠️ You worked as a **{job[0]}** and earned **${payout:,}**!")
 
     @commands.hybrid_command(name="claim", description="Claim income from your roles.")
     async def claim(self, ctx: commands.Context):
         await ctx.defer()
-        now = datetime.now(timezone.utc)
         user_id = ctx.author.id
-        print("1. Claim command invoked by user:", user_id)
-
-        async with self.db_lock:
-            try:
-                async with aiosqlite.connect("economy.db", timeout=10) as db:
-                    await db.execute("INSERT OR IGNORE INTO last_claims (user_id, last_claim) VALUES (?, ?)", (user_id, None))
-
-                    async with db.execute("SELECT last_claim FROM last_claims WHERE user_id = ?", (user_id,)) as cursor:
-                        result = await cursor.fetchone()
-                        last_claim_raw = result[0] if result else None
-                        print("2. Last claim fetched for user:", user_id, "Last claim time:", last_claim_raw)
-
-                        if last_claim_raw is not None:
-                            last_claim = datetime.fromisoformat(last_claim_raw).replace(tzinfo=timezone.utc)
-                            if now - last_claim < timedelta(hours=24):
-                                return await ctx.send("🕒 You already claimed your role income today. Come back later!")
-
-                    await db.execute("UPDATE last_claims SET last_claim = ? WHERE user_id = ?", (now.isoformat(), user_id))
-                    print("3. Last claim updated for user:", user_id, "New claim time:", now.isoformat())
-
-                    total_income = 0
-                    roles_with_income = []
-                    roles_checked = []
-
-                    for role in ctx.author.roles:
-                        if role == ctx.guild.default_role:
-                            continue
-
-                        async with db.execute("SELECT income_amount FROM role_income WHERE role_id = ?", (role.id,)) as cursor:
-                            row = await cursor.fetchone()
-                            income = row[0] if row else 0
-                            roles_checked.append(f"{role.name}: ${income}")
-
-                            if income > 0:
-                                roles_with_income.append(f"{role.name}: ${income}")
-                                total_income += income
-
-                            print(f"4. Checking role {role.name} for user {user_id}: Income amount found: {row}")
-
-                    print(f"4a. All roles checked for user {user_id}: {roles_checked}")
-                    print(f"4b. Roles with income for user {user_id}: {roles_with_income}")
-                    print(f"5. Total income calculated for user {user_id}: ${total_income}")
+        log.debug("Claim command invoked by user %s", user_id)
 
-                    await self.update_balance(user_id, total_income, db)
-                    print(f"6. Balance updated for user {user_id}")
+        economy = await self.guild_economy(ctx.guild.id)
 
-                    await db.commit()
-                    print(f"7. Database changes committed for user {user_id}")
-
-            except Exception as e:
-                print(f"Critical error in claim command for user {user_id}: {e}")
+        async with self.user_locks((ctx.guild.id, user_id)):
+            try:
+                # The cooldown check and the new claim time are one statement; no row changes while on cooldown.
+                claimed = await economy.db.execute(CLAIM_INCOME, (ctx.guild.id, user_id, now_epoch(), CLAIM_COOLDOWN))
+                on_cooldown = claimed == 0
+
+                if not on_cooldown:
+                    role_income = economy.catalog.tables["role_income"]
+                    incomes = [
+                        role_income[role.id][1] for role in ctx.author.roles
+                        if role.id in role_income and role != ctx.guild.default_role
+                    ]
+                    total_income = sum(income for income in incomes if income > 0)
+                    log.debug("User %s claimed $%s from %s of %s roles", user_id, total_income, len(incomes), len(ctx.author.roles))
+                    economy.ledger.add(user_id, total_income)
+
+            except Exception:
+                log.exception("Critical error in claim command for user %s", user_id)
                 return await ctx.send("❌ An error occurred while processing your claim. Please try again later.")
 
+        if on_cooldown:
+            return await ctx.send("🕒 You already claimed your role income today. Come back later!")
         if total_income == 0:
             await ctx.send("""✅ Claim successful, but none of your roles have income configured.
 -# If you are an admin, use `/addroleincome` to set income for roles.""")
@@ -115,169 +538,178 @@ class Economy(commands.Cog):
     async def rob(self, ctx, target: discord.Member):
         if target.id == ctx.author.id:
             return await ctx.send("You can't rob yourself.")
-        async with self.db_lock:
-            target_balance = await self.get_balance(target.id)
+        economy = await self.guild_economy(ctx.guild.id)
+        async with self.user_locks((ctx.guild.id, ctx.author.id), (ctx.guild.id, target.id)):
+            target_balance = await economy.ledger.balance(target.id)
             if target_balance < 100:
                 return await ctx.send("Target doesn't have enough money.")
             success = random.random() < 0.5
             amount = random.randint(50, min(500, target_balance))
             if success:
-                await self.update_balance(ctx.author.id, amount)
-                await self.update_balance(target.id, -amount)
-                await ctx.send(f"💰 You successfully robbed {target.mention} for **${amount:,}**!")
+                async with economy.ledger.transaction() as db:
+                    robbed = await economy.ledger.spend(db, target.id, amount)
+                if not robbed:
+                    return await ctx.send("Target doesn't have enough money.")
+                economy.ledger.add(ctx.author.id, amount)
             else:
-                await self.update_balance(ctx.author.id, -amount)
-                await ctx.send(f"🚓 You got caught and lost **${amount:,}**!")
+                economy.ledger.add(ctx.author.id, -amount)
+        if success:
+            await ctx.send(f"💰 You successfully robbed {target.mention} for **${amount:,}**!")
+        else:
+            await ctx.send(f"🚓 You got caught and lost **${amount:,}**!")
 
     @commands.hybrid_command(name="crime", description="Attempt a crime for money.")
     async def crime(self, ctx):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                async with db.execute("SELECT name, success_chance, reward_min, reward_max FROM robberies") as cursor:
-                    crimes = await cursor.fetchall()
-                    if not crimes:
-                        return await ctx.send("No crimes available. Ask an admin to add some using `/addrobbery`.")
-                    crime = random.choice(crimes)
-                    success = random.random() < (crime[1] / 100)
-                    reward = random.randint(crime[2], crime[3])
-                    if success:
-                        await self.update_balance(ctx.author.id, reward, db)
-                        await ctx.send(f"🦹‍♂️ You succeeded in **{crime[0]}** and earned **${reward:,}**!")
-                    else:
-                        await self.update_balance(ctx.author.id, -reward, db)
-                        await ctx.send(f"👮 You failed in **{crime[0]}** and lost **${reward:,}**!")
-                await db.commit()
+        economy = await self.guild_economy(ctx.guild.id)
+        crimes = economy.catalog.rows("robberies")
+        if not crimes:
+            return await ctx.send("No crimes available. Ask an admin to add some using `/addrobbery`.")
+        crime = random.choice(crimes)
+        success = random.random() < (crime[1] / 100)
+        reward = random.randint(crime[2], crime[3])
+        economy.ledger.add(ctx.author.id, reward if success else -reward)
+        if success:
+            await ctx.send(f"🦹‍♂️ You succeeded in **{crime[0]}** and earned **${reward:,}**!")
+        else:
+            await ctx.send(f"👮 You failed in **{crime[0]}** and lost **${reward:,}**!")
 
 
     @commands.hybrid_command(name="addjob", description="Admin: Add a job.")
     @commands.has_permissions(administrator=True)
     async def add_job(self, ctx, name: str, min_pay: int, max_pay: int):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                await db.execute("INSERT OR REPLACE INTO jobs (name, payout_min, payout_max) VALUES (?, ?, ?)", (name, min_pay, max_pay))
-                await db.commit()
-                await ctx.send(f"✅ Job **{name}** added with payout range ${min_pay:,}–${max_pay:,}")
+        economy = await self.guild_economy(ctx.guild.id)
+        await economy.catalog.upsert("jobs", name, min_pay, max_pay)
+        await ctx.send(f"✅ Job **{name}** added with payout range ${min_pay:,}–${max_pay:,}")
 
     @commands.hybrid_command(name="removejob", description="Admin: Remove a job.")
     @commands.has_permissions(administrator=True)
     async def remove_job(self, ctx, name: str):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                result = await db.execute("DELETE FROM jobs WHERE name = ?", (name,))
-                await db.commit()
-                if result.rowcount == 0:
-                    await ctx.send(f"❌ No job named **{name}** found.")
-                else:
-                    await ctx.send(f"🗑️ Job **{name}** removed.")
+        economy = await self.guild_economy(ctx.guild.id)
+        if not await economy.catalog.remove("jobs", name):
+            await ctx.send(f"❌ No job named **{name}** found.")
+        else:
+            await ctx.send(f"🗑️ Job **{name}** removed.")
 
     @commands.hybrid_command(name="addrobbery", description="Admin: Add a robbery scenario.")
     @commands.has_permissions(administrator=True)
     async def add_robbery(self, ctx, name: str, success_chance: float, min_reward: int, max_reward: int):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                await db.execute("INSERT OR REPLACE INTO robberies (name, success_chance, reward_min, reward_max) VALUES (?, ?, ?, ?)", (name, success_chance, min_reward, max_reward))
-                await db.commit()
-                await ctx.send(f"✅ Robbery **{name}** added with success chance {success_chance:.2f}")
+        economy = await self.guild_economy(ctx.guild.id)
+        await economy.catalog.upsert("robberies", name, success_chance, min_reward, max_reward)
+        await ctx.send(f"✅ Robbery **{name}** added with success chance {success_chance:.2f}")
 
     @commands.hybrid_command(name="removerobbery", description="Admin: Remove a robbery scenario.")
     @commands.has_permissions(administrator=True)
     async def remove_robbery(self, ctx, name: str):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                result = await db.execute("DELETE FROM robberies WHERE name = ?", (name,))
-                await db.commit()
-                if result.rowcount == 0:
-                    await ctx.send(f"❌ No robbery named **{name}** found.")
-                else:
-                    await ctx.send(f"🗑️ Robbery **{name}** removed.")
+        economy = await self.guild_economy(ctx.guild.id)
+        if not await economy.catalog.remove("robberies", name):
+            await ctx.send(f"❌ No robbery named **{name}** found.")
+        else:
+            await ctx.send(f"🗑️ Robbery **{name}** removed.")
 
     @commands.hybrid_command(name="additem", description="Admin: Add a shop item.")
     @commands.has_permissions(administrator=True)
     async def add_item(self, ctx, name: str, price: int):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                await db.execute("INSERT OR REPLACE INTO items (name, price) VALUES (?, ?)", (name.lower(), price))
-                await db.commit()
-                await ctx.send(f"🛍️ Added item **{name}** for ${price:,}")
+        economy = await self.guild_economy(ctx.guild.id)
+        await economy.catalog.upsert("items", name.lower(), price)
+        await ctx.send(f"🛍️ Added item **{name}** for ${price:,}")
 
     @commands.hybrid_command(name="removeitem", description="Admin: Remove a shop item.")
     @commands.has_permissions(administrator=True)
     async def remove_item(self, ctx, name: str):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                result = await db.execute("DELETE FROM items WHERE name = ?", (name.lower(),))
-                await db.commit()
-                if result.rowcount == 0:
-                    await ctx.send(f"❌ No item named **{name}** found.")
-                else:
-                    await ctx.send(f"🗑️ Item **{name}** removed.")
+        economy = await self.guild_economy(ctx.guild.id)
+        if not await economy.catalog.remove("items", name.lower()):
+            await ctx.send(f"❌ No item named **{name}** found.")
+        else:
+            await ctx.send(f"🗑️ Item **{name}** removed.")
 
     @commands.hybrid_command(name="addroleincome", description="Admin: Set income for a role.")
     @commands.has_permissions(administrator=True)
     async def add_role_income(self, ctx, role: discord.Role, amount: int):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                await db.execute("INSERT OR REPLACE INTO role_income (role_id, income_amount) VALUES (?, ?)", (role.id, amount))
-                await db.commit()
-                await ctx.send(f"✅ Set role {role.mention} to receive ${amount:,} on claim.")
+        economy = await self.guild_economy(ctx.guild.id)
+        await economy.catalog.upsert("role_income", role.id, amount)
+        await ctx.send(f"✅ Set role {role.mention} to receive ${amount:,} on claim.")
 
     @commands.hybrid_command(name="removeroleincome", description="Admin: Remove income for a role.")
     @commands.has_permissions(administrator=True)
     async def remove_role_income(self, ctx, role: discord.Role):
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                result = await db.execute("DELETE FROM role_income WHERE role_id = ?", (role.id,))
-                await db.commit()
-                if result.rowcount == 0:
-                    await ctx.send(f"❌ No income set for role {role.mention}.")
-                else:
-                    await ctx.send(f"🗑️ Removed income for role {role.mention}.")
+        economy = await self.guild_economy(ctx.guild.id)
+        if not await economy.catalog.remove("role_income", role.id):
+            await ctx.send(f"❌ No income set for role {role.mention}.")
+        else:
+            await ctx.send(f"🗑️ Removed income for role {role.mention}.")
+
+    @commands.hybrid_group(name="economy", description="Economy data management commands", invoke_without_command=True)
+    @commands.has_permissions(administrator=True)
+    async def economy_group(self, ctx: commands.Context):
+        await ctx.send("Use `/economy import` or `/economy export` to move jobs, items, robberies, role incomes or balances in bulk.")
+
+    @economy_group.command(name="import", description="Admin: Bulk import rows from a CSV or JSON Lines file.")
+    @commands.has_permissions(administrator=True)
+    async def import_data(self, ctx: commands.Context, table: Literal["jobs", "items", "robberies", "role_income", "users"], file: discord.Attachment):
+        if not file.filename.lower().endswith((".csv", ".jsonl")):
+            return await ctx.send("❌ Upload a `.csv` file with a header row or a `.jsonl` file.")
+        await ctx.defer()
+        economy = await self.guild_economy(ctx.guild.id)
+        try:
+            count = await economy.import_rows(table, read_records(file))
+        except (ValueError, aiohttp.ClientError) as e:
+            return await ctx.send(f"❌ Import failed, nothing was changed: {e}")
+        await ctx.send(f"📥 Imported **{count:,}** rows into `{table}`.")
+
+    @economy_group.command(name="export", description="Admin: Export rows as a CSV or JSON Lines file.")
+    @commands.has_permissions(administrator=True)
+    async def export_data(self, ctx: commands.Context, table: Literal["jobs", "items", "robberies", "role_income", "users"], file_type: Literal["csv", "jsonl"] = "csv"):
+        await ctx.defer()
+        economy = await self.guild_economy(ctx.guild.id)
+        with tempfile.NamedTemporaryFile("w", suffix=f".{file_type}", newline="", encoding="utf-8", delete=False) as out:
+            count = await economy.export_rows(table, out, file_type)
+        try:
+            await ctx.send(f"📤 Exported **{count:,}** rows from `{table}`.", file=discord.File(out.name, filename=f"{table}.{file_type}"))
+        finally:
+            os.remove(out.name)
 
     @commands.hybrid_command(name="shop", description="View available items.")
     async def shop(self, ctx):
-        async with aiosqlite.connect("economy.db", timeout=10) as db:
-            async with db.execute("SELECT name, price FROM items") as cursor:
-                items = await cursor.fetchall()
-                if not items:
-                    return await ctx.send("No items in the shop.")
-                embed = discord.Embed(title="🛒 Shop")
-                for item in items:
-                    embed.add_field(name=item[0].title(), value=f"${item[1]:,}", inline=False)
-                await ctx.send(embed=embed)
+        economy = await self.guild_economy(ctx.guild.id)
+        items = economy.catalog.rows("items")
+        if not items:
+            return await ctx.send("No items in the shop.")
+        embed = discord.Embed(title="🛒 Shop")
+        for item in items:
+            embed.add_field(name=item[0].title(), value=f"${item[1]:,}", inline=False)
+        await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="buy", description="Buy an item from the shop.")
     async def buy(self, ctx, item_name: str, quantity: int = 1):
         item_name = item_name.lower()
-        async with self.db_lock:
-            async with aiosqlite.connect("economy.db", timeout=10) as db:
-                async with db.execute("SELECT price FROM items WHERE name = ?", (item_name,)) as cursor:
-                    row = await cursor.fetchone()
-                    if not row:
-                        return await ctx.send("Item not found.")
-                    total_cost = row[0] * quantity
-                    balance = await self.get_balance(ctx.author.id)
-                    if balance < total_cost:
-                        return await ctx.send("You don't have enough money.")
-                    await self.update_balance(ctx.author.id, -total_cost, db)
+        economy = await self.guild_economy(ctx.guild.id)
+        item = economy.catalog.get("items", item_name)
+        if not item:
+            return await ctx.send("Item not found.")
+        total_cost = item[1] * quantity
+        async with self.user_locks((ctx.guild.id, ctx.author.id)):
+            async with economy.ledger.transaction() as db:
+                paid = await economy.ledger.spend(db, ctx.author.id, total_cost)
+                if paid:
                     await db.execute(
-                        "INSERT INTO inventory (user_id, item_name, quantity) VALUES (?, ?, ?) "
-                        "ON CONFLICT(user_id, item_name) DO UPDATE SET quantity = quantity + ?",
-                        (ctx.author.id, item_name, quantity, quantity)
+                        "INSERT INTO inventory (guild_id, user_id, item_name, quantity) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(guild_id, user_id, item_name) DO UPDATE SET quantity = quantity + ?",
+                        (ctx.guild.id, ctx.author.id, item_name, quantity, quantity)
                     )
-                    await db.commit()
-                    await ctx.send(f"✅ You bought {quantity}x **{item_name.title()}** for **${total_cost:,}**")
+        if not paid:
+            return await ctx.send("You don't have enough money.")
+        await ctx.send(f"✅ You bought {quantity}x **{item_name.title()}** for **${total_cost:,}**")
 
     @commands.hybrid_command(name="inventory", description="Check your inventory.")
     async def inventory(self, ctx):
-        async with aiosqlite.connect("economy.db", timeout=10) as db:
-            async with db.execute("SELECT item_name, quantity FROM inventory WHERE user_id = ?", (ctx.author.id,)) as cursor:
-                items = await cursor.fetchall()
-                if not items:
-                    return await ctx.send("Your inventory is empty.")
-                embed = discord.Embed(title=f"{ctx.author.name}'s Inventory")
-                for item in items:
-                    embed.add_field(name=item[0].title(), value=f"x{item[1]}", inline=False)
-                await ctx.send(embed=embed)
+        economy = await self.guild_economy(ctx.guild.id)
+        items = await economy.db.fetchall("SELECT item_name, quantity FROM inventory WHERE guild_id = ? AND user_id = ?", (ctx.guild.id, ctx.author.id))
+        if not items:
+            return await ctx.send("Your inventory is empty.")
+        embed = discord.Embed(title=f"{ctx.author.name}'s Inventory")
+        for item in items:
+            embed.add_field(name=item[0].title(), value=f"x{item[1]}", inline=False)
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Economy(bot))
@@ -1,64 +1,479 @@
 import discord
-from discord.ext import commands, tasks
-import aiosqlite
-from datetime import datetime, timedelta, timezone
+from discord import app_commands
+from discord.ext import commands
+from discord.ui import Button, button, View
+import asyncio
+import heapq
+import logging
+import re
+import time
+from itertools import islice
+from datetime import datetime, timedelta
+from settings.database import Database, BatchWriter
+from settings.utils import now_epoch, to_epoch
+from settings.views import Paginator
+
+log = logging.getLogger(__name__)
+
+INSERT_ACTION = "INSERT INTO mod_actions (guild_id, user_id, moderator_id, action, reason, timestamp) VALUES (?, ?, ?, ?, ?, ?)"
+
+class UnmuteScheduler:
+    """Timer queue of timed mutes.
+
+    Deadlines sit in a min-heap keyed on their unmute time. The runner sleeps
+    until the earliest one (or until an earlier deadline is scheduled) and
+    hands every entry that is due to ``callback`` as one batch. Cancelled or
+    rescheduled entries are dropped lazily when they reach the top.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.heap: list[tuple[float, int, int]] = []
+        self.deadlines: dict[tuple[int, int], float] = {}
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, guild_id: int, user_id: int, unmute_at: float):
+        self.deadlines[(guild_id, user_id)] = unmute_at
+        heapq.heappush(self.heap, (unmute_at, guild_id, user_id))
+        if self.heap[0][0] == unmute_at:
+            self._wakeup.set()
+
+    def cancel(self, guild_id: int, user_id: int):
+        self.deadlines.pop((guild_id, user_id), None)
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            unmute_at, guild_id, user_id = heapq.heappop(self.heap)
+            if self.deadlines.get((guild_id, user_id)) == unmute_at:
+                del self.deadlines[(guild_id, user_id)]
+                due.append((guild_id, user_id))
+        return due
+
+    async def run(self):
+        while True:
+            while self.heap and self.deadlines.get(self.heap[0][1:]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            timeout = max(0, self.heap[0][0] - time.time()) if self.heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            due = self._pop_due(time.time())
+            if due:
+                try:
+                    await self.callback(due)
+                except Exception:
+                    log.exception("Failed to process %s automatic unmutes", len(due))
+
+MUTED_ROLE_NAME = "Muted"
+MUTED_OVERWRITE = discord.PermissionOverwrite(speak=False, send_messages=False, add_reactions=False)
+BULK_CONCURRENCY = 8
+BULK_BAN_CHUNK = 200
+PROGRESS_INTERVAL = 2.0
+# Unmutes that could not be applied (guild unavailable, member not cached,
+# role removal failed) are retried after this many seconds.
+UNMUTE_RETRY_SECONDS = 5 * 60
+
+async def fan_out(items, action, progress=None, concurrency: int = BULK_CONCURRENCY) -> list:
+    """Await ``action(item)`` for every item, ``concurrency`` at a time.
+
+    discord.py waits out 429s on its own; the semaphore keeps us from queueing
+    hundreds of requests against the same rate-limit bucket at once.
+    ``progress(done, total)`` is awaited at most every ``PROGRESS_INTERVAL``
+    seconds and once at the end. Returns the items whose request failed.
+    """
+    total = len(items)
+    done = 0
+    failed = []
+    semaphore = asyncio.Semaphore(concurrency)
+    last_report = time.monotonic()
+
+    async def run(item):
+        nonlocal done, last_report
+        async with semaphore:
+            try:
+                await action(item)
+            except discord.HTTPException as e:
+                log.debug("Bulk action failed for %r: %s", item, e)
+                failed.append(item)
+        done += 1
+        if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await progress(done, total)
+
+    await asyncio.gather(*(run(item) for item in items))
+    if progress is not None:
+        await progress(done, total)
+    return failed
+
+async def apply_overwrites(channels, target, overwrite: discord.PermissionOverwrite, progress=None) -> list:
+    """Set ``overwrite`` for ``target`` on every channel that does not already have it."""
+    pending = [channel for channel in channels if channel.overwrites_for(target) != overwrite]
+    return await fan_out(
+        pending,
+        lambda channel: channel.set_permissions(target, overwrite=overwrite, reason="Muted role setup"),
+        progress
+    )
+
+PURGE_MAX = 10000
+PURGE_SCAN_LIMIT = 50000
+BULK_DELETE_CHUNK = 100
+OLD_DELETE_DELAY = 1.0
+
+async def purge_messages(channel, amount: int, check, before=None, after=None, reason: str = None, progress=None) -> tuple[int, int]:
+    """Delete up to ``amount`` messages matching ``check``, newest first.
+
+    History is streamed page by page while a second task deletes what has been
+    matched so far. Messages younger than 14 days go out in bulk deletes of up to
+    100; older ones can only be deleted one at a time, so those are spaced out
+    by ``OLD_DELETE_DELAY``. Returns ``(deleted, scanned)``.
+    """
+    # Leave some slack so a message does not age past the bulk-delete limit while queued.
+    bulk_cutoff = discord.utils.utcnow() - timedelta(days=14) + timedelta(minutes=5)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    deleted = 0
+    scanned = 0
+    last_report = time.monotonic()
+
+    async def deleter():
+        nonlocal deleted, last_report
+        while (item := await queue.get()) is not None:
+            try:
+                if isinstance(item, list):
+                    await channel.delete_messages(item, reason=reason)
+                    deleted += len(item)
+                else:
+                    await item.delete()
+                    deleted += 1
+                    await asyncio.sleep(OLD_DELETE_DELAY)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                log.debug("Purge delete failed in channel %s: %s", channel.id, e)
+            if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                await progress(deleted, amount)
+
+    task = asyncio.create_task(deleter())
+    try:
+        matched = 0
+        batch = []
+        async for message in channel.history(limit=PURGE_SCAN_LIMIT, before=before, after=after, oldest_first=False):
+            scanned += 1
+            if not check(message):
+                continue
+            matched += 1
+            if message.created_at > bulk_cutoff:
+                batch.append(message)
+                if len(batch) == BULK_DELETE_CHUNK:
+                    await queue.put(batch)
+                    batch = []
+            else:
+                if batch:
+                    await queue.put(batch)
+                    batch = []
+                await queue.put(message)
+            if matched >= amount:
+                break
+        if batch:
+            await queue.put(batch)
+    finally:
+        await queue.put(None)
+        await task
+    if progress is not None:
+        await progress(deleted, amount)
+    return deleted, scanned
+
+def snowflake(value: str):
+    """A message ID or link as a ``discord.Object``, or None if ``value`` is empty."""
+    if not value:
+        return None
+    ids = re.findall(r"\d{15,20}", value)
+    if not ids:
+        raise ValueError(value)
+    return discord.Object(int(ids[-1]))
+
+class PurgeFlags(commands.FlagConverter):
+    user: discord.User = commands.flag(default=None, description="Only delete messages from this user")
+    bots: bool = commands.flag(default=False, description="Only delete messages from bots")
+    contains: str = commands.flag(default=None, description="Only delete messages containing this text")
+    attachments: bool = commands.flag(default=False, description="Only delete messages with attachments")
+    before: str = commands.flag(default=None, description="Only delete messages before this message ID or link")
+    after: str = commands.flag(default=None, description="Only delete messages after this message ID or link")
+    reason: str = commands.flag(description="Why these messages are being deleted")
+
+class MassActionFlags(commands.FlagConverter):
+    targets: str = commands.flag(default=None, description="Mentions or IDs separated by spaces")
+    joined_within: int = commands.flag(default=0, description="Also include members who joined in the last N minutes")
+    reason: str = commands.flag(description="Why these users are being banned, kicked or timed out")
+
+class MassTimeoutFlags(MassActionFlags):
+    duration: int = commands.flag(default=10, description="How long the timeout lasts, in units of unit")
+    unit: str = commands.flag(default="m", description="s, m, h or d")
+
+class ConfirmView(View):
+    def __init__(self, author_id: int):
+        super().__init__(timeout=60)
+        self.author_id = author_id
+        self.confirmed = False
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    @button(label="Confirm", style=discord.ButtonStyle.danger)
+    async def confirm(self, interaction: discord.Interaction, button: Button):
+        self.confirmed = True
+        await interaction.response.defer()
+        self.stop()
+
+    @button(label="Cancel", style=discord.ButtonStyle.gray)
+    async def cancel(self, interaction: discord.Interaction, button: Button):
+        await interaction.response.defer()
+        self.stop()
+
+MODLOG_PAGE_SIZE = 10
+
+async def fetch_mod_actions(db: Database, guild_id: int, user_id=None, action=None, since=None, before=None) -> list:
+    """Up to ``MODLOG_PAGE_SIZE + 1`` actions, newest first, older than action id ``before``.
+
+    Keyset pagination: each page continues from the last action id of the
+    previous one, so deep pages cost the same as the first. With a user the
+    (guild_id, user_id, action_id) index drives the scan, otherwise
+    (guild_id, action_id) does.
+    """
+    clauses = ["guild_id = ?"]
+    params = [guild_id]
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if action is not None:
+        clauses.append("action = ?")
+        params.append(action)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if before is not None:
+        clauses.append("action_id < ?")
+        params.append(before)
+    return await db.fetchall(
+        "SELECT action_id, user_id, moderator_id, action, reason, timestamp FROM mod_actions "
+        f"WHERE {' AND '.join(clauses)} ORDER BY action_id DESC LIMIT ?",
+        (*params, MODLOG_PAGE_SIZE + 1)
+    )
+
+def modlog_embed(rows: list, page: int) -> discord.Embed:
+    lines = []
+    for action_id, user_id, moderator_id, action, reason, timestamp in rows:
+        target = f"<@{user_id}>" if user_id else "—"
+        lines.append(f"`#{action_id}` <t:{timestamp}:R> **{action}** {target} by <@{moderator_id}>\n> {reason}")
+    embed = discord.Embed(title="Moderation Log", description="\n".join(lines) or "No matching actions.", color=0xFF0000)
+    embed.set_footer(text=f"Page {page + 1}")
+    return embed
+
+BANLIST_PAGE_SIZE = 20
+
+class BanCache:
+    """Snapshot of one guild's bans, kept current by ban and unban events.
+
+    ``load()`` streams ``guild.bans()`` once; after that pages are served from
+    memory without API calls. Pages are sliced lazily out of the dict, so a
+    page never copies more than ``BANLIST_PAGE_SIZE + 1`` entries.
+    """
+
+    def __init__(self):
+        self.users: dict[int, str] = {}
+        self.ready = False
+        self.lock = asyncio.Lock()
+
+    async def load(self, guild: discord.Guild):
+        async with self.lock:
+            if self.ready:
+                return
+            async for entry in guild.bans(limit=None):
+                self.users[entry.user.id] = entry.user.name
+            self.ready = True
+
+    def add(self, user: discord.abc.User):
+        self.users[user.id] = user.name
+
+    def remove(self, user: discord.abc.User):
+        self.users.pop(user.id, None)
+
+    def page(self, offset: int, search: str = None) -> list:
+        entries = self.users.items()
+        if search:
+            needle = search.lower()
+            entries = ((user_id, name) for user_id, name in entries if needle in name.lower() or search == str(user_id))
+        return list(islice(entries, offset, offset + BANLIST_PAGE_SIZE + 1))
+
+def banlist_embed(bans: BanCache, search: str, rows: list, page: int) -> discord.Embed:
+    lines = [f"{name} (ID: {user_id})" for user_id, name in rows]
+    if lines:
+        description = "\n".join(lines)
+    else:
+        description = f"No bans match `{search}`." if search else "No one is banned."
+    title = f"Banned Users matching \"{search}\"" if search else "Banned Users"
+    embed = discord.Embed(title=title, description=description, color=0xFF0000)
+    embed.set_footer(text=f"Page {page + 1} • {len(bans.users)} bans total")
+    return embed
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db_path = "moderation.db"
-        self.bot.loop.create_task(self.initialize_db())
-        self.check_mutes.start()
-
-    async def initialize_db(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS mutes (
-                    guild_id INTEGER,
-                    user_id INTEGER,
-                    unmute_at TEXT,
-                    PRIMARY KEY(guild_id, user_id)
-                )
-            """)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS mod_actions (
-                    action_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    user_id INTEGER,
-                    moderator_id INTEGER,
-                    action TEXT,
-                    reason TEXT,
-                    timestamp TEXT
-                )
-            """)
-            await db.commit()
+        self.db = Database(self.db_path, readers=2)
+        self.audit = BatchWriter(self.db, INSERT_ACTION)
+        self.unmutes = UnmuteScheduler(self.expire_mutes)
+        self._unmute_task = None
+        self.muted_roles: dict[int, int] = {}
+        self._muted_role_locks: dict[int, asyncio.Lock] = {}
+        self.ban_caches: dict[int, BanCache] = {}
+
+    async def cog_load(self):
+        await self.db.open()
+        self.audit.start()
+        rows = await self.db.fetchall("SELECT guild_id, user_id, unmute_at FROM mutes WHERE unmute_at IS NOT NULL ORDER BY unmute_at")
+        for guild_id, user_id, unmute_at in rows:
+            self.unmutes.schedule(guild_id, user_id, unmute_at)
+        self._unmute_task = asyncio.create_task(self.run_unmutes())
+
+    async def cog_unload(self):
+        if self._unmute_task is not None:
+            self._unmute_task.cancel()
+        await self.audit.stop()
+        await self.db.close()
+
+    async def run_unmutes(self):
+        await self.bot.wait_until_ready()
+        await self.unmutes.run()
 
     async def log_action(self, guild_id, user_id, moderator_id, action, reason):
-        timestamp = datetime.utcnow().isoformat()
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO mod_actions (guild_id, user_id, moderator_id, action, reason, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                (guild_id, user_id, moderator_id, action, reason, timestamp)
-            )
-            await db.commit()
+        """Queue a mod_actions row. It is written in the background with other pending actions."""
+        await self.log_actions(guild_id, [user_id], moderator_id, action, reason)
+
+    async def log_actions(self, guild_id, user_ids, moderator_id, action, reason):
+        """Queue one mod_actions row per user; they are committed in the same transaction."""
+        timestamp = now_epoch()
+        await self.audit.put(*((guild_id, user_id, moderator_id, action, reason, timestamp) for user_id in user_ids))
+
+    def progress_reporter(self, message: discord.Message, text: str):
+        """A ``progress(done, total)`` callback that edits ``message`` to ``text`` plus a counter."""
+        async def progress(done, total):
+            try:
+                await message.edit(content=f"{text} {done}/{total}")
+            except discord.HTTPException:
+                pass
+        return progress
+
+    def muted_role(self, guild: discord.Guild):
+        """The guild's Muted role, or None. The id is cached so lookups skip the scan over guild.roles."""
+        role_id = self.muted_roles.get(guild.id)
+        if role_id is not None:
+            role = guild.get_role(role_id)
+            if role is not None:
+                return role
+        role = discord.utils.get(guild.roles, name=MUTED_ROLE_NAME)
+        if role is None:
+            self.muted_roles.pop(guild.id, None)
+        else:
+            self.muted_roles[guild.id] = role.id
+        return role
+
+    async def ensure_muted_role(self, guild: discord.Guild, progress=None):
+        """Return the Muted role, creating it and denying it in every channel if it is missing."""
+        async with self._muted_role_locks.setdefault(guild.id, asyncio.Lock()):
+            role = self.muted_role(guild)
+            if role is not None:
+                return role
+            role = await guild.create_role(name=MUTED_ROLE_NAME, reason="Needed for muting")
+            self.muted_roles[guild.id] = role.id
+            failed = await apply_overwrites(guild.channels, role, MUTED_OVERWRITE, progress)
+            if failed:
+                log.warning("Muted role overwrites failed on %s of %s channels in guild %s", len(failed), len(guild.channels), guild.id)
+            return role
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if self.muted_roles.get(role.guild.id) == role.id:
+            del self.muted_roles[role.guild.id]
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name and MUTED_ROLE_NAME in (before.name, after.name):
+            self.muted_roles.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_ban(self, guild: discord.Guild, user: discord.abc.User):
+        bans = self.ban_caches.get(guild.id)
+        if bans is not None:
+            bans.add(user)
+
+    @commands.Cog.listener()
+    async def on_member_unban(self, guild: discord.Guild, user: discord.User):
+        bans = self.ban_caches.get(guild.id)
+        if bans is not None:
+            bans.remove(user)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.ban_caches.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # A fresh session (not a resume) may have missed ban events, so rebuild snapshots on the next /banlist.
+        self.ban_caches.clear()
+        self.muted_roles.pop(guild.id, None)
 
     def _validate_reason(self, reason: str):
         if not reason or reason.strip() == "":
             return False
         return True
 
-    @commands.hybrid_command(name="purge", description="Delete a number of messages. Reason required.")
+    @commands.hybrid_command(name="purge", description="Delete messages, optionally filtered. Reason required.")
     @commands.has_permissions(manage_messages=True)
-    async def purge(self, ctx, amount: int, *, reason: str):
-        if amount < 1 or amount > 100:
-            return await ctx.send("Please specify an amount between 1 and 100.")
-        if not self._validate_reason(reason):
+    async def purge(self, ctx, amount: int, *, flags: PurgeFlags):
+        if amount < 1 or amount > PURGE_MAX:
+            return await ctx.send(f"Please specify an amount between 1 and {PURGE_MAX}.")
+        if not self._validate_reason(flags.reason):
             return await ctx.send("You must provide a valid reason for purging messages.")
-        
-        deleted = await ctx.channel.purge(limit=amount + 1)
-        await ctx.send(f"🧹 Deleted {len(deleted)-1} messages.", delete_after=5)
-        
-        await self.log_action(ctx.guild.id, None, ctx.author.id, "purge", reason)
+        try:
+            before = snowflake(flags.before)
+            after = snowflake(flags.after)
+        except ValueError:
+            return await ctx.send("`before` and `after` must be message IDs or links.")
+
+        needle = flags.contains.lower() if flags.contains else None
+
+        def check(message: discord.Message) -> bool:
+            if flags.user is not None and message.author.id != flags.user.id:
+                return False
+            if flags.bots and not message.author.bot:
+                return False
+            if needle is not None and needle not in message.content.lower():
+                return False
+            if flags.attachments and not message.attachments:
+                return False
+            return True
+
+        if ctx.interaction is None:
+            try:
+                await ctx.message.delete()
+            except discord.HTTPException:
+                pass
+        else:
+            await ctx.defer()
+        status = await ctx.send("🧹 Purging...")
+        deleted, scanned = await purge_messages(
+            ctx.channel, amount, check,
+            before=before or status, after=after, reason=flags.reason,
+            progress=self.progress_reporter(status, "🧹 Purging... deleted")
+        )
+        await status.edit(content=f"🧹 Deleted {deleted} messages ({scanned} scanned).")
+        await status.delete(delay=10)
+
+        await self.log_action(ctx.guild.id, None, ctx.author.id, "purge", flags.reason)
 
     @commands.hybrid_command(name="kick", description="Kick a user from the server. Reason required.")
     @commands.has_permissions(kick_members=True)
@@ -96,13 +511,159 @@ class Moderation(commands.Cog):
         except Exception as e:
             await ctx.send(f"❌ Failed to unban: {e}")
 
-    @commands.hybrid_command(name="banlist", description="List all banned users in the server.")
-    async def banlist(self, ctx: commands.Context):
+    def select_targets(self, ctx: commands.Context, targets: str, joined_within: int) -> list:
+        """User ids named in ``targets`` plus members who joined in the last ``joined_within`` minutes.
+
+        The caller, the bot, the owner and anyone at or above the caller's or
+        the bot's top role are left out.
+        """
+        guild = ctx.guild
+        user_ids = {int(user_id) for user_id in re.findall(r"\d{15,20}", targets or "")}
+        if joined_within > 0:
+            cutoff = discord.utils.utcnow() - timedelta(minutes=joined_within)
+            user_ids.update(m.id for m in guild.members if not m.bot and m.joined_at and m.joined_at >= cutoff)
+        user_ids -= {ctx.author.id, self.bot.user.id, guild.owner_id}
+
+        selected = []
+        for user_id in sorted(user_ids):
+            member = guild.get_member(user_id)
+            if member is not None:
+                if member.top_role >= guild.me.top_role:
+                    continue
+                if ctx.author.id != guild.owner_id and member.top_role >= ctx.author.top_role:
+                    continue
+            selected.append(user_id)
+        return selected
+
+    async def run_bulk(self, ctx: commands.Context, action: str, emoji: str, user_ids: list, execute, reason: str):
+        """Confirm, run ``execute(user_ids, progress)`` and log one audit row per success in a single commit."""
+        if not user_ids:
+            return await ctx.send("No matching members to act on.")
+        view = ConfirmView(ctx.author.id)
+        status = await ctx.send(f"⚠️ This will {action} **{len(user_ids)}** accounts. Reason: {reason}", view=view)
+        await view.wait()
+        if not view.confirmed:
+            return await status.edit(content=f"Cancelled mass {action}.", view=None)
+
+        await status.edit(content=f"{emoji} Working...", view=None)
+        started = time.monotonic()
+        failed = set(await execute(user_ids, self.progress_reporter(status, f"{emoji} Working...")))
+        succeeded = [user_id for user_id in user_ids if user_id not in failed]
+        await self.log_actions(ctx.guild.id, succeeded, ctx.author.id, action, reason)
+
+        summary = f"{emoji} Mass {action}: {len(succeeded)}/{len(user_ids)} succeeded in {time.monotonic() - started:.1f}s."
+        if failed:
+            summary += f" Failed: {', '.join(str(user_id) for user_id in sorted(failed)[:20])}"
+            if len(failed) > 20:
+                summary += f" and {len(failed) - 20} more"
+        await status.edit(content=summary)
+
+    @commands.hybrid_command(name="massban", description="Ban many users by mention/ID or recent join. Reason required.")
+    @commands.has_permissions(ban_members=True)
+    async def massban(self, ctx: commands.Context, *, flags: MassActionFlags):
+        reason = flags.reason
+        if not self._validate_reason(reason):
+            return await ctx.send("You must provide a valid reason for banning.")
+        await ctx.defer()
+
+        async def execute(user_ids, progress):
+            failed = []
+            for i in range(0, len(user_ids), BULK_BAN_CHUNK):
+                chunk = user_ids[i:i + BULK_BAN_CHUNK]
+                try:
+                    result = await ctx.guild.bulk_ban([discord.Object(user_id) for user_id in chunk], reason=reason)
+                    failed.extend(user.id for user in result.failed)
+                except discord.HTTPException as e:
+                    log.debug("Bulk ban of %s users failed: %s", len(chunk), e)
+                    failed.extend(chunk)
+                await progress(i + len(chunk), len(user_ids))
+            return failed
+
+        await self.run_bulk(ctx, "ban", "🔨", self.select_targets(ctx, flags.targets, flags.joined_within), execute, reason)
+
+    @commands.hybrid_command(name="masskick", description="Kick many members by mention/ID or recent join. Reason required.")
+    @commands.has_permissions(kick_members=True)
+    async def masskick(self, ctx: commands.Context, *, flags: MassActionFlags):
+        reason = flags.reason
+        if not self._validate_reason(reason):
+            return await ctx.send("You must provide a valid reason for kicking.")
         await ctx.defer()
-        bans = [entry async for entry in ctx.guild.bans(limit=2000)]
-        banned_users = "\n".join([f"{ban.user.name} (ID: {ban.user.id})" for ban in bans])
-        embed = discord.Embed(title="Banned Users", description=banned_users, color=0xFF0000)
-        await ctx.send(embed=embed)
+
+        async def execute(user_ids, progress):
+            members = [m for m in map(ctx.guild.get_member, user_ids) if m is not None]
+            present = {m.id for m in members}
+            failed = await fan_out(members, lambda member: member.kick(reason=reason), progress)
+            return [m.id for m in failed] + [user_id for user_id in user_ids if user_id not in present]
+
+        await self.run_bulk(ctx, "kick", "👢", self.select_targets(ctx, flags.targets, flags.joined_within), execute, reason)
+
+    @commands.hybrid_command(name="masstimeout", description="Timeout many members by mention/ID or recent join. Reason required.")
+    @commands.has_permissions(moderate_members=True)
+    async def masstimeout(self, ctx: commands.Context, *, flags: MassTimeoutFlags):
+        reason = flags.reason
+        if not self._validate_reason(reason):
+            return await ctx.send("You must provide a valid reason for timeout.")
+        units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+        seconds = flags.duration * units.get(flags.unit.lower(), 60)
+        if not 0 < seconds <= 28 * 86400:
+            return await ctx.send("Timeouts must be between 1 second and 28 days.")
+        await ctx.defer()
+        until = discord.utils.utcnow() + timedelta(seconds=seconds)
+
+        async def execute(user_ids, progress):
+            members = [m for m in map(ctx.guild.get_member, user_ids) if m is not None]
+            present = {m.id for m in members}
+            failed = await fan_out(members, lambda member: member.timeout(until, reason=reason), progress)
+            return [m.id for m in failed] + [user_id for user_id in user_ids if user_id not in present]
+
+        await self.run_bulk(ctx, "timeout", "⏲️", self.select_targets(ctx, flags.targets, flags.joined_within), execute, reason)
+
+    @commands.hybrid_command(name="modlog", description="Browse logged moderation actions.")
+    @commands.has_permissions(moderate_members=True)
+    @app_commands.describe(since="A duration like 7d or 12h, or a date like 2025-01-31")
+    async def modlog(self, ctx: commands.Context, user: discord.User = None, action: str = None, since: str = None):
+        since_epoch = None
+        if since:
+            units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+            try:
+                if since[-1].lower() in units and since[:-1].isdigit():
+                    since_epoch = now_epoch() - int(since[:-1]) * units[since[-1].lower()]
+                else:
+                    since_epoch = to_epoch(datetime.fromisoformat(since))
+            except ValueError:
+                return await ctx.send("Use a duration like `7d` or `12h`, or a date like `2025-01-31`, for `since`.")
+
+        query = {
+            "guild_id": ctx.guild.id,
+            "user_id": user.id if user else None,
+            "action": action.lower() if action else None,
+            "since": since_epoch,
+        }
+
+        async def fetch(page, previous):
+            return await fetch_mod_actions(self.db, **query, before=previous[-1][0] if previous else None)
+
+        view = await Paginator(ctx.author.id, MODLOG_PAGE_SIZE, fetch, modlog_embed, labels=("Newer", "Older")).start()
+        await ctx.send(embed=view.embed(), view=view)
+
+    @commands.hybrid_command(name="banlist", description="List all banned users in the server.")
+    @app_commands.describe(search="Only show users whose name contains this text, or with this exact ID")
+    async def banlist(self, ctx: commands.Context, *, search: str = None):
+        bans = self.ban_caches.setdefault(ctx.guild.id, BanCache())
+        if not bans.ready:
+            await ctx.defer()
+            try:
+                await bans.load(ctx.guild)
+            except discord.Forbidden:
+                return await ctx.send("❌ I need the Ban Members permission to read the ban list.")
+
+        async def fetch(page, previous):
+            return bans.page(page * BANLIST_PAGE_SIZE, search)
+
+        view = await Paginator(
+            ctx.author.id, BANLIST_PAGE_SIZE, fetch, lambda rows, page: banlist_embed(bans, search, rows, page)
+        ).start()
+        await ctx.send(embed=view.embed(), view=view)
 
     @commands.hybrid_command(name="mute", description="Mute a user. Reason required.")
     @commands.has_permissions(manage_roles=True)
@@ -110,16 +671,13 @@ class Moderation(commands.Cog):
         if not self._validate_reason(reason):
             return await ctx.send("You must provide a valid reason for muting.")
         guild = ctx.guild
-        muted_role = discord.utils.get(guild.roles, name="Muted")
+        muted_role = self.muted_role(guild)
         if muted_role is None:
-            muted_role = await guild.create_role(name="Muted", reason="Needed for muting")
-            for channel in guild.channels:
-                try:
-                    await channel.set_permissions(muted_role, speak=False, send_messages=False, add_reactions=False)
-                except Exception:
-                    pass
+            await ctx.defer()
+            status = await ctx.send(f"⚙️ Setting up the Muted role in {len(guild.channels)} channels...")
+            muted_role = await self.ensure_muted_role(guild, self.progress_reporter(status, "⚙️ Setting up the Muted role... channels"))
 
-        if muted_role in member.roles:
+        if member.get_role(muted_role.id):
             return await ctx.send(f"{member.mention} is already muted.")
 
         await member.add_roles(muted_role, reason=reason)
@@ -127,18 +685,16 @@ class Moderation(commands.Cog):
         unmute_at = None
         if duration > 0:
             units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
-            seconds = duration * units.get(unit.lower(), 60)
-            unmute_at = datetime.utcnow() + timedelta(seconds=seconds)
-            unmute_at_str = unmute_at.isoformat()
-        else:
-            unmute_at_str = None
+            unmute_at = now_epoch() + duration * units.get(unit.lower(), 60)
 
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO mutes (guild_id, user_id, unmute_at)
-                VALUES (?, ?, ?)
-            """, (guild.id, member.id, unmute_at_str))
-            await db.commit()
+        await self.db.execute("""
+            INSERT OR REPLACE INTO mutes (guild_id, user_id, unmute_at)
+            VALUES (?, ?, ?)
+        """, (guild.id, member.id, unmute_at))
+        if unmute_at is None:
+            self.unmutes.cancel(guild.id, member.id)
+        else:
+            self.unmutes.schedule(guild.id, member.id, unmute_at)
 
         await ctx.send(f"🔇 Muted {member.mention} for {duration}{unit if duration > 0 else ''}. Reason: {reason}")
         await self.log_action(ctx.guild.id, member.id, ctx.author.id, "mute", reason)
@@ -149,15 +705,14 @@ class Moderation(commands.Cog):
         if not self._validate_reason(reason):
             return await ctx.send("You must provide a valid reason for unmuting.")
         guild = ctx.guild
-        muted_role = discord.utils.get(guild.roles, name="Muted")
-        if muted_role is None or muted_role not in member.roles:
+        muted_role = self.muted_role(guild)
+        if muted_role is None or not member.get_role(muted_role.id):
             return await ctx.send(f"{member.mention} is not muted.")
 
         await member.remove_roles(muted_role, reason=reason)
 
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM mutes WHERE guild_id = ? AND user_id = ?", (guild.id, member.id))
-            await db.commit()
+        await self.db.execute("DELETE FROM mutes WHERE guild_id = ? AND user_id = ?", (guild.id, member.id))
+        self.unmutes.cancel(guild.id, member.id)
 
         await ctx.send(f"🔊 Unmuted {member.mention}. Reason: {reason}")
         await self.log_action(ctx.guild.id, member.id, ctx.author.id, "unmute", reason)
@@ -189,34 +744,48 @@ class Moderation(commands.Cog):
         except Exception as e:
             await ctx.send(f"❌ Failed to remove timeout: {e}")
 
-    @tasks.loop(minutes=1)
-    async def check_mutes(self):
-        now = datetime.utcnow().replace(tzinfo=timezone.utc)
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT guild_id, user_id, unmute_at FROM mutes WHERE unmute_at IS NOT NULL") as cursor:
-                rows = await cursor.fetchall()
-                for guild_id, user_id, unmute_at_str in rows:
-                    unmute_at = datetime.fromisoformat(unmute_at_str).replace(tzinfo=timezone.utc)
-                    if now >= unmute_at:
-                        guild = self.bot.get_guild(guild_id)
-                        if guild is None:
-                            continue
-                        member = guild.get_member(user_id)
-                        if member is None:
-                            continue
-                        muted_role = discord.utils.get(guild.roles, name="Muted")
-                        if muted_role in member.roles:
-                            try:
-                                await member.remove_roles(muted_role, reason="Automatic unmute after mute duration")
-                                await self.log_action(guild_id, user_id, self.bot.user.id, "auto_unmute", "Automatic unmute after timed mute expired")
-                            except Exception:
-                                pass
-                        await db.execute("DELETE FROM mutes WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-                await db.commit()
-
-    @check_mutes.before_loop
-    async def before_check_mutes(self):
-        await self.bot.wait_until_ready()
+    async def expire_mutes(self, due: list):
+        """Lift every mute in ``due``, a batch of ``(guild_id, user_id)`` pairs whose time is up.
+
+        Rows are only deleted for mutes that were actually lifted; the rest are
+        retried after UNMUTE_RETRY_SECONDS and stay in the table until then.
+        """
+        async def unmute(guild_id, user_id) -> bool:
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                return False
+            member = guild.get_member(user_id)
+            if member is None:
+                return False
+            muted_role = self.muted_role(guild)
+            if muted_role is not None and member.get_role(muted_role.id):
+                try:
+                    await member.remove_roles(muted_role, reason="Automatic unmute after mute duration")
+                except Exception:
+                    log.exception("Failed to unmute %s in guild %s", user_id, guild_id)
+                    return False
+                await self.log_action(guild_id, user_id, self.bot.user.id, "auto_unmute", "Automatic unmute after timed mute expired")
+            return True
+
+        results = await asyncio.gather(*(unmute(guild_id, user_id) for guild_id, user_id in due), return_exceptions=True)
+        handled = []
+        retry_at = time.time() + UNMUTE_RETRY_SECONDS
+        for (guild_id, user_id), result in zip(due, results):
+            if result is True:
+                handled.append((guild_id, user_id))
+            elif (guild_id, user_id) not in self.unmutes.deadlines:
+                if isinstance(result, BaseException):
+                    log.error("Failed to unmute %s in guild %s", user_id, guild_id, exc_info=result)
+                self.unmutes.schedule(guild_id, user_id, retry_at)
+        if not handled:
+            return
+        # Only delete rows that are still due, in case a member was muted again meanwhile.
+        now = now_epoch()
+        async with self.db.transaction() as db:
+            await db.executemany(
+                "DELETE FROM mutes WHERE guild_id = ? AND user_id = ? AND unmute_at <= ?",
+                [(guild_id, user_id, now) for guild_id, user_id in handled]
+            )
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
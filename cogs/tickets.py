@@ -1,58 +1,442 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ui import Button, button, View
 import asyncio
-import io
+import contextlib
+import html
+import json
+import logging
 import chat_exporter
-import aiosqlite
 import uuid
 import aiohttp
+import settings
+from datetime import datetime, timezone
+from settings.database import Database, BatchWriter
+from settings.transcripts import transcript_store
+from settings.utils import now_epoch, to_epoch
+
+log = logging.getLogger(__name__)
+
+TICKET_TOPIC = "{} DO NOT CHANGE THE TOPIC OF THIS CHANNEL!"
+CATEGORY_LIMIT = 50
+CATEGORY_NAMES = {"open": "Opened Tickets", "closed": "Closed Tickets"}
+INACTIVITY_SECONDS = int(settings.TICKET_INACTIVITY_HOURS * 3600)
+RETENTION_SECONDS = int(settings.TICKET_RETENTION_HOURS * 3600)
+SWEEP_BATCH = 25
+SWEEP_DELAY = 1.0
+# Transcript jobs tried for an expired ticket before its channel is left alone.
+ARCHIVE_MAX_JOBS = 3
+
+class Ticket:
+    def __init__(self, ticket_id: int, guild_id: int, owner_id: int, channel_id: int, status: str, opened_at: int, closed_at: int = None, last_activity_at: int = None, captured: bool = False):
+        self.ticket_id = ticket_id
+        self.guild_id = guild_id
+        self.owner_id = owner_id
+        self.channel_id = channel_id
+        self.status = status
+        self.opened_at = opened_at
+        self.closed_at = closed_at
+        self.last_activity_at = last_activity_at or opened_at
+        self.captured = bool(captured)
+
+class TicketRegistry:
+    """Open and closed tickets, indexed by channel and by (guild, owner) for open ones.
+
+    The ``tickets`` table is the source of truth and is read once at startup;
+    afterwards every lookup is a dict hit and every change is written through.
+    Deleted tickets stay in the table for history but leave the index.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.by_channel: dict[int, Ticket] = {}
+        self.open_by_owner: dict[tuple[int, int], Ticket] = {}
+        # Owners whose ticket channel is being created, so a double click can't open two.
+        self.creating: set[tuple[int, int]] = set()
+        # Channels of tickets being closed, which stay open until the move to a closed category succeeds.
+        self.closing: set[int] = set()
+
+    def _index(self, ticket: Ticket):
+        self.by_channel[ticket.channel_id] = ticket
+        if ticket.status == "open":
+            self.open_by_owner[(ticket.guild_id, ticket.owner_id)] = ticket
+
+    async def load(self):
+        rows = await self.db.fetchall(
+            "SELECT ticket_id, guild_id, owner_id, channel_id, status, opened_at, closed_at, "
+            "(SELECT MAX(created_at) FROM ticket_messages m WHERE m.ticket_id = t.ticket_id AND m.bot IS NOT 1), captured "
+            "FROM tickets t WHERE status != 'deleted'"
+        )
+        self.by_channel.clear()
+        self.open_by_owner.clear()
+        for row in rows:
+            self._index(Ticket(*row))
+
+    def get(self, channel_id: int):
+        return self.by_channel.get(channel_id)
+
+    def open_ticket(self, guild_id: int, owner_id: int):
+        return self.open_by_owner.get((guild_id, owner_id))
+
+    async def add(self, guild_id: int, owner_id: int, channel_id: int, status: str = "open", captured: bool = False) -> Ticket:
+        """Register a ticket channel. ``captured`` marks tickets whose messages are all captured from the first one."""
+        opened_at = now_epoch()
+        closed_at = opened_at if status == "closed" else None
+        async with self.db.transaction() as db:
+            cursor = await db.execute(
+                "INSERT INTO tickets (guild_id, owner_id, channel_id, status, opened_at, closed_at, captured) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, owner_id, channel_id, status, opened_at, closed_at, int(captured))
+            )
+            ticket_id = cursor.lastrowid
+        ticket = Ticket(ticket_id, guild_id, owner_id, channel_id, status, opened_at, closed_at, captured=captured)
+        self._index(ticket)
+        return ticket
+
+    async def close(self, ticket: Ticket):
+        ticket.status = "closed"
+        ticket.closed_at = now_epoch()
+        await self.db.execute("UPDATE tickets SET status = 'closed', closed_at = ? WHERE ticket_id = ?", (ticket.closed_at, ticket.ticket_id))
+        if self.open_by_owner.get((ticket.guild_id, ticket.owner_id)) is ticket:
+            del self.open_by_owner[(ticket.guild_id, ticket.owner_id)]
+
+    async def delete(self, ticket: Ticket):
+        await self.db.execute("UPDATE tickets SET status = 'deleted' WHERE ticket_id = ?", (ticket.ticket_id,))
+        self.by_channel.pop(ticket.channel_id, None)
+        if self.open_by_owner.get((ticket.guild_id, ticket.owner_id)) is ticket:
+            del self.open_by_owner[(ticket.guild_id, ticket.owner_id)]
+        ticket.status = "deleted"
+
+class CategoryPool:
+    """Open and closed ticket categories per guild, past Discord's 50 channels per category.
+
+    The categories made by ``/tickets setup`` are the primaries. When every
+    category of a kind is full an overflow category is created with the
+    primary's permissions, and overflow categories that empty out are deleted
+    again. Tickets go to the least-full category; channels still being created
+    count towards that so a burst of tickets doesn't overfill one category.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.overflow: dict[tuple[int, str], list[int]] = {}
+        self.pending: dict[int, int] = {}
+        self._locks: dict[tuple[int, str], asyncio.Lock] = {}
+
+    async def load(self):
+        self.overflow.clear()
+        for category_id, guild_id, kind in await self.db.fetchall("SELECT category_id, guild_id, kind FROM ticket_categories ORDER BY category_id"):
+            self.overflow.setdefault((guild_id, kind), []).append(category_id)
+
+    def categories(self, guild: discord.Guild, kind: str, primary_id: int) -> list:
+        ids = [primary_id, *self.overflow.get((guild.id, kind), ())]
+        return [category for category in map(guild.get_channel, ids) if category is not None]
+
+    def _load(self, category: discord.CategoryChannel) -> int:
+        return len(category.channels) + self.pending.get(category.id, 0)
+
+    @contextlib.asynccontextmanager
+    async def allocate(self, guild: discord.Guild, kind: str, primary_id: int):
+        """Yield the least-full category of ``kind``, creating an overflow category if all are full."""
+        async with self._locks.setdefault((guild.id, kind), asyncio.Lock()):
+            open_slots = [c for c in self.categories(guild, kind, primary_id) if self._load(c) < CATEGORY_LIMIT]
+            if open_slots:
+                category = min(open_slots, key=self._load)
+            else:
+                category = await self._create(guild, kind, primary_id)
+            self.pending[category.id] = self.pending.get(category.id, 0) + 1
+        try:
+            yield category
+        finally:
+            self.pending[category.id] -= 1
+            if not self.pending[category.id]:
+                del self.pending[category.id]
+
+    async def _create(self, guild: discord.Guild, kind: str, primary_id: int) -> discord.CategoryChannel:
+        primary = guild.get_channel(primary_id)
+        overwrites = primary.overwrites if primary else {guild.default_role: discord.PermissionOverwrite(read_messages=False)}
+        overflow = self.overflow.setdefault((guild.id, kind), [])
+        taken = {category.name for category in self.categories(guild, kind, primary_id)}
+        number = next(n for n in range(2, len(taken) + 3) if f"{CATEGORY_NAMES[kind]} {n}" not in taken)
+        category = await guild.create_category(f"{CATEGORY_NAMES[kind]} {number}", overwrites=overwrites, reason="Ticket categories are full")
+        await self.db.execute("INSERT INTO ticket_categories (category_id, guild_id, kind) VALUES (?, ?, ?)", (category.id, guild.id, kind))
+        overflow.append(category.id)
+        return category
+
+    async def release(self, guild: discord.Guild, category_id: int):
+        """Delete ``category_id`` if it is an overflow category with nothing left in it."""
+        for kind in CATEGORY_NAMES:
+            if category_id not in self.overflow.get((guild.id, kind), ()):
+                continue
+            async with self._locks.setdefault((guild.id, kind), asyncio.Lock()):
+                category = guild.get_channel(category_id)
+                if category is not None and (category.channels or self.pending.get(category_id)):
+                    return
+                await self.forget(category_id)
+                if category is not None:
+                    try:
+                        await category.delete(reason="Overflow ticket category is empty")
+                    except discord.HTTPException as e:
+                        log.warning("Could not delete empty ticket category %s: %s", category_id, e)
+            return
 
-async def get_ticket_settings(guild_id):
-    async with aiosqlite.connect("ticket_system.db") as db:
-        async with db.execute('SELECT admin_role_id, opened_tickets_category_id, closed_tickets_category_id, log_channel_id FROM ticket_settings WHERE guild_id = ?', (guild_id,)) as cursor:
-            return await cursor.fetchone()
+    async def forget(self, category_id: int):
+        for ids in self.overflow.values():
+            if category_id in ids:
+                ids.remove(category_id)
+                await self.db.execute("DELETE FROM ticket_categories WHERE category_id = ?", (category_id,))
+                return
 
-async def get_transcript(channel: discord.TextChannel, bot: commands.Bot):
-    unique_id = str(uuid.uuid4())
-    
-    transcript = await chat_exporter.export(
-        channel,
-        tz_info="UTC",
-        military_time=True,
-        bot=bot,
+    async def clear(self, guild_id: int):
+        await self.db.execute("DELETE FROM ticket_categories WHERE guild_id = ?", (guild_id,))
+        for kind in CATEGORY_NAMES:
+            self.overflow.pop((guild_id, kind), None)
+
+# One statement covers new messages, edits and deletes. Going through a single
+# BatchWriter keeps them in arrival order; NULL columns leave stored values alone.
+CAPTURE_MESSAGE = """
+    INSERT INTO ticket_messages (ticket_id, message_id, author_id, author_name, bot, content, attachments, embeds, created_at, edited_at, deleted)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(ticket_id, message_id) DO UPDATE SET
+        content = COALESCE(excluded.content, content),
+        attachments = COALESCE(excluded.attachments, attachments),
+        embeds = COALESCE(excluded.embeds, embeds),
+        edited_at = COALESCE(excluded.edited_at, edited_at),
+        deleted = MAX(deleted, excluded.deleted)
+"""
+RENDER_CHUNK = 200
+EXPORT_CHUNK = 64 * 1024
+
+def message_row(ticket_id: int, message: discord.Message) -> tuple:
+    attachments = [attachment.url for attachment in message.attachments]
+    embeds = [{"title": embed.title, "description": embed.description} for embed in message.embeds]
+    return (
+        ticket_id, message.id, message.author.id, str(message.author), int(message.author.bot), message.content,
+        json.dumps(attachments) if attachments else None,
+        json.dumps(embeds) if embeds else None,
+        to_epoch(message.created_at),
+        to_epoch(message.edited_at) if message.edited_at else None,
+        0
     )
 
-    if transcript is None:
-        return
+def deleted_row(ticket_id: int, message_id: int) -> tuple:
+    return (ticket_id, message_id, None, None, None, None, None, None, None, None, 1)
+
+TRANSCRIPT_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ background: #313338; color: #dbdee1; font-family: "gg sans", "Helvetica Neue", Arial, sans-serif; margin: 0; padding: 16px 24px; }}
+h1 {{ font-size: 18px; border-bottom: 1px solid #3f4147; padding-bottom: 8px; }}
+.msg {{ padding: 4px 0; }}
+.author {{ color: #f2f3f5; font-weight: 600; }}
+.time, .edited {{ color: #949ba4; font-size: 12px; margin-left: 6px; }}
+.content {{ white-space: pre-wrap; word-wrap: break-word; }}
+.embed {{ border-left: 4px solid #4e5058; background: #2b2d31; padding: 6px 10px; margin: 4px 0; max-width: 520px; }}
+.deleted .content {{ text-decoration: line-through; color: #949ba4; }}
+a {{ color: #00a8fc; }} img {{ max-width: 400px; display: block; margin-top: 4px; }}
+</style></head><body>
+<h1>{title}</h1>
+"""
+
+async def render_transcript(db: Database, ticket_id: int, title: str):
+    """Yield the HTML transcript of a ticket as UTF-8 chunks from its captured messages.
+
+    Rows are read ``RENDER_CHUNK`` at a time, so memory stays flat however long
+    the ticket ran. A reader connection is held until the generator finishes or
+    is closed.
+    """
+    yield TRANSCRIPT_HEAD.format(title=html.escape(title)).encode('utf-8')
+    async with db.read() as conn:
+        async with conn.execute(
+            "SELECT author_name, content, attachments, embeds, created_at, edited_at, deleted FROM ticket_messages "
+            "WHERE ticket_id = ? AND created_at IS NOT NULL ORDER BY message_id",
+            (ticket_id,)
+        ) as cursor:
+            while rows := await cursor.fetchmany(RENDER_CHUNK):
+                parts = []
+                for author_name, content, attachments, embeds, created_at, edited_at, deleted in rows:
+                    when = datetime.fromtimestamp(created_at, timezone.utc).strftime("%Y-%m-%d %H:%M")
+                    parts.append(f'<div class="msg{" deleted" if deleted else ""}"><span class="author">{html.escape(author_name)}</span><span class="time">{when}</span>')
+                    if edited_at:
+                        parts.append('<span class="edited">(edited)</span>')
+                    if deleted:
+                        parts.append('<span class="edited">(deleted)</span>')
+                    if content:
+                        parts.append(f'<div class="content">{html.escape(content)}</div>')
+                    for embed in json.loads(embeds) if embeds else ():
+                        parts.append(
+                            f'<div class="embed"><b>{html.escape(embed["title"] or "")}</b>'
+                            f'<div class="content">{html.escape(embed["description"] or "")}</div></div>'
+                        )
+                    for url in json.loads(attachments) if attachments else ():
+                        url = html.escape(url, quote=True)
+                        if url.split("?")[0].lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
+                            parts.append(f'<a href="{url}"><img src="{url}" loading="lazy"></a>')
+                        else:
+                            parts.append(f'<a href="{url}">{url}</a>')
+                    parts.append("</div>\n")
+                yield "".join(parts).encode('utf-8')
+    yield b"</body></html>\n"
+
+async def export_chunks(transcript: str):
+    """Encode a chat_exporter transcript a slice at a time instead of copying it whole."""
+    for i in range(0, len(transcript), EXPORT_CHUNK):
+        yield transcript[i:i + EXPORT_CHUNK].encode('utf-8')
+
+class TranscriptJob:
+    def __init__(self, job_id: int, ticket_id: int, guild_id: int, channel_id: int, owner_id: int, log_channel_id: int, attempts: int = 0):
+        self.job_id = job_id
+        self.ticket_id = ticket_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.owner_id = owner_id
+        self.log_channel_id = log_channel_id
+        self.attempts = attempts
+
+class TranscriptQueue:
+    """Renders and uploads ticket transcripts in the background.
+
+    Every job is a row in ``transcript_jobs``, so pending work survives a
+    restart. ``workers`` tasks pull jobs from an in-memory queue and share one
+    aiohttp session.
+
+    Transcripts are rendered from the messages ``capture`` recorded while the
+    ticket was open. Tickets opened before capture existed only have part of
+    their conversation captured, so they fall back to re-reading channel
+    history. The HTML is streamed
+    into ``store`` (see settings.transcripts) chunk by chunk.
+
+    A failed job is put back with exponential backoff via ``call_later``, so
+    no worker sits idle waiting for it, until it runs out of attempts.
+    """
+
+    def __init__(self, bot: commands.Bot, db: Database, capture: BatchWriter, workers: int = settings.TRANSCRIPT_WORKERS, max_attempts: int = 5, backoff: int = 30):
+        self.bot = bot
+        self.db = db
+        self.capture = capture
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.session: aiohttp.ClientSession | None = None
+        self.store = None
+        self._workers: list[asyncio.Task] = []
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120))
+        self.store = transcript_store(self.session)
+        rows = await self.db.fetchall(
+            "SELECT job_id, ticket_id, guild_id, channel_id, owner_id, log_channel_id, attempts, next_attempt_at "
+            "FROM transcript_jobs WHERE status = 'pending' ORDER BY next_attempt_at"
+        )
+        now = now_epoch()
+        for *row, next_attempt_at in rows:
+            self._schedule(TranscriptJob(*row), next_attempt_at - now)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        """Stop the workers. Unfinished jobs stay pending in the database and run after the next start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def submit(self, ticket: "Ticket", log_channel_id: int):
+        now = now_epoch()
+        async with self.db.transaction() as db:
+            cursor = await db.execute(
+                "INSERT INTO transcript_jobs (ticket_id, guild_id, channel_id, owner_id, log_channel_id, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ticket.ticket_id, ticket.guild_id, ticket.channel_id, ticket.owner_id, log_channel_id, now, now)
+            )
+            job_id = cursor.lastrowid
+        self._schedule(TranscriptJob(job_id, ticket.ticket_id, ticket.guild_id, ticket.channel_id, ticket.owner_id, log_channel_id), 0)
+
+    def _schedule(self, job: TranscriptJob, delay: float):
+        if delay <= 0:
+            self.queue.put_nowait(job)
+            return
 
-    transcript_bytes = io.BytesIO(transcript.encode('utf-8'))
-    transcript_filename = f"{unique_id}_{channel.topic.split(' ')[0]}_ticket.html"
-    
-    async with aiohttp.ClientSession() as session:
-        form_data = aiohttp.FormData()
-        form_data.add_field(
-            'file',
-            transcript_bytes,
-            filename=transcript_filename,
-            content_type='text/html'
+        def release():
+            del self._timers[job.job_id]
+            self.queue.put_nowait(job)
+
+        self._timers[job.job_id] = asyncio.get_running_loop().call_later(delay, release)
+
+    async def _work(self):
+        await self.bot.wait_until_ready()
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                # A failed bookkeeping write must not take the worker down with it.
+                # The job is still pending in the database and runs again after a restart.
+                try:
+                    await self._retry(job, e)
+                except Exception:
+                    log.exception("Failed to record the failure of transcript job %s", job.job_id)
+
+    async def _run(self, job: TranscriptJob):
+        channel = self.bot.get_channel(job.channel_id)
+        await self.capture.flush()
+        captured = await self.db.fetchone("SELECT captured FROM tickets WHERE ticket_id = ?", (job.ticket_id,))
+        if captured and captured[0]:
+            guild = self.bot.get_guild(job.guild_id)
+            title = f"{guild.name if guild else job.guild_id} / {channel.name if channel else f'ticket-{job.ticket_id}'}"
+            chunks = render_transcript(self.db, job.ticket_id, title)
+        else:
+            if channel is None:
+                await self._finish(job, "failed", error="ticket channel no longer exists")
+                return
+            transcript = await chat_exporter.export(channel, tz_info="UTC", military_time=True, bot=self.bot)
+            if transcript is None:
+                await self._finish(job, "failed", error="chat_exporter returned no transcript")
+                return
+            chunks = export_chunks(transcript)
+        # Closed explicitly so a failed upload hands the render's reader connection straight back.
+        async with contextlib.aclosing(chunks):
+            url = await self.store.save(f"{uuid.uuid4()}_{job.owner_id}_ticket.html", chunks)
+
+        if url.startswith(("http://", "https://")):
+            description = f"Click [here]({url}) for the transcript."
+        else:
+            description = f"Transcript saved as `{url}`."
+        embed = discord.Embed(title="Ticket closed.", description=description, color=discord.Color.red())
+        guild = self.bot.get_guild(job.guild_id)
+        for target in (guild.get_channel(job.log_channel_id) if guild else None, channel):
+            if target is not None:
+                try:
+                    await target.send(embed=embed)
+                except discord.HTTPException:
+                    pass
+        await self._finish(job, "done", url=url)
+
+    async def _retry(self, job: TranscriptJob, error: Exception):
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            log.error("Transcript job %s for ticket %s failed after %s attempts: %s", job.job_id, job.ticket_id, job.attempts, error)
+            await self._finish(job, "failed", error=str(error))
+            return
+        delay = self.backoff * 2 ** (job.attempts - 1)
+        log.warning("Transcript job %s failed (attempt %s/%s), retrying in %ss: %s", job.job_id, job.attempts, self.max_attempts, delay, error)
+        self._schedule(job, delay)
+        await self.db.execute(
+            "UPDATE transcript_jobs SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE job_id = ?",
+            (job.attempts, now_epoch() + delay, str(error), job.job_id)
+        )
+
+    async def _finish(self, job: TranscriptJob, status: str, url: str = None, error: str = None):
+        await self.db.execute(
+            "UPDATE transcript_jobs SET status = ?, attempts = ?, url = ?, last_error = ? WHERE job_id = ?",
+            (status, job.attempts, url, error, job.job_id)
         )
-        
-        async with session.post("https://sheepie.pythonanywhere.com/upload", data=form_data) as response:
-            response_text = await response.text()
-            if response.status == 200:
-                _, _, _, log_channel_id = await get_ticket_settings(channel.guild.id)
-                log_channel = channel.guild.get_channel(log_channel_id)
-                embed = discord.Embed(
-                    title="Ticket closed.",
-                    description=f"Click [here](https://sheepie.pythonanywhere.com/uploads/{transcript_filename}) for the transcript.",
-                    color=discord.Color.red()
-                )
-                await log_channel.send(embed=embed)
-                await channel.send(embed=embed)
-            else:
-                print(f"Failed to upload file. Status code: {response.status}")
-                print(f"Response text: {response_text}")
 
 class CreateButton(View):
     def __init__(self, bot: commands.Bot):
@@ -63,19 +447,23 @@ class CreateButton(View):
     async def ticket(self, interaction: discord.Interaction, button: Button):
         await interaction.response.defer(ephemeral=True)
 
-        settings = await get_ticket_settings(interaction.guild.id)
+        tickets = interaction.client.get_cog("Tickets")
+        settings = tickets.ticket_settings(interaction.guild.id)
         if not settings:
             await interaction.followup.send("Ticket system is not configured for this server. Run ``/tickets setup``", ephemeral=True)
             return
         
         admin_role_id, opened_tickets_category_id, _, log_channel_id = settings
-        
-        category: discord.CategoryChannel = discord.utils.get(interaction.guild.categories, id=opened_tickets_category_id)
-        for ch in category.text_channels:
-            if ch.topic == f"{interaction.user.id} DO NOT CHANGE THE TOPIC OF THIS CHANNEL!":
-                await interaction.followup.send(f"You already have a ticket open in {ch.mention}", ephemeral=True)
-                return
-        
+
+        key = (interaction.guild.id, interaction.user.id)
+        existing = tickets.registry.open_ticket(*key)
+        if existing:
+            await interaction.followup.send(f"You already have a ticket open in <#{existing.channel_id}>", ephemeral=True)
+            return
+        if key in tickets.registry.creating:
+            await interaction.followup.send("Your ticket is already being created.", ephemeral=True)
+            return
+
         r1: discord.Role = interaction.guild.get_role(admin_role_id)
         overwrites = {
             interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
@@ -84,11 +472,21 @@ class CreateButton(View):
             interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
         }
 
-        channel = await category.create_text_channel(
-            name=f"{interaction.user}-ticket",
-            topic=f"{interaction.user.id} DO NOT CHANGE THE TOPIC OF THIS CHANNEL!",
-            overwrites=overwrites
-        )
+        tickets.registry.creating.add(key)
+        try:
+            async with tickets.categories.allocate(interaction.guild, "open", opened_tickets_category_id) as category:
+                channel = await category.create_text_channel(
+                    name=f"{interaction.user}-ticket",
+                    topic=TICKET_TOPIC.format(interaction.user.id),
+                    overwrites=overwrites
+                )
+            await tickets.registry.add(interaction.guild.id, interaction.user.id, channel.id, captured=True)
+        except discord.HTTPException as e:
+            log.warning("Could not create a ticket in guild %s: %s", interaction.guild.id, e)
+            await interaction.followup.send("❌ Couldn't create your ticket right now. Please try again later.", ephemeral=True)
+            return
+        finally:
+            tickets.registry.creating.discard(key)
 
         await channel.send(f"<@&{admin_role_id}>", embed=discord.Embed(
             title="Ticket Created!", 
@@ -109,30 +507,25 @@ class CloseButton(View):
     async def close(self, interaction: discord.Interaction, button: Button):
         await interaction.response.defer(ephemeral=True)
 
-        settings = await get_ticket_settings(interaction.guild.id)
+        tickets = interaction.client.get_cog("Tickets")
+        settings = tickets.ticket_settings(interaction.guild.id)
         if not settings:
             await interaction.followup.send("Ticket system is not configured for this server.", ephemeral=True)
             return
 
-        admin_role_id, _, closed_tickets_category_id, log_channel_id = settings
-
-        await interaction.channel.send("Closing this ticket in 3 seconds...")
-        await asyncio.sleep(3)
-
-        category: discord.CategoryChannel = discord.utils.get(interaction.guild.categories, id=closed_tickets_category_id)
-        r1: discord.Role = interaction.guild.get_role(admin_role_id)
-        overwrites = {
-            interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            r1: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True),
-            interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        }
-
-        await interaction.channel.edit(category=category, overwrites=overwrites)
-        await interaction.channel.send(embed=discord.Embed(description="Ticket Closed!", color=discord.Color.random()), view=TrashButton())
+        ticket = tickets.registry.get(interaction.channel.id)
+        if ticket is None or ticket.status != "open":
+            await interaction.followup.send("This ticket is already closed.", ephemeral=True)
+            return
+        if ticket.channel_id in tickets.registry.closing:
+            await interaction.followup.send("This ticket is already being closed.", ephemeral=True)
+            return
 
-        log_channel = interaction.guild.get_channel(log_channel_id)
-        if log_channel:
-            await get_transcript(interaction.channel, self.bot)
+        try:
+            await tickets.close_ticket(interaction.guild, interaction.channel, ticket, delay=3)
+        except discord.HTTPException as e:
+            log.warning("Could not close ticket %s: %s", ticket.ticket_id, e)
+            await interaction.followup.send("❌ Couldn't close this ticket right now. Please try again later.", ephemeral=True)
 
 class TrashButton(View):
     def __init__(self):
@@ -145,18 +538,241 @@ class TrashButton(View):
 
         await asyncio.sleep(3)
 
-        settings = await get_ticket_settings(interaction.guild.id)
-        log_channel_id = settings[3]
-
-        log_channel = interaction.guild.get_channel(log_channel_id)
+        tickets = interaction.client.get_cog("Tickets")
+        settings = tickets.ticket_settings(interaction.guild.id)
+        log_channel = interaction.guild.get_channel(settings[3]) if settings else None
         if log_channel:
             await log_channel.send(f"Ticket **{interaction.channel.name}** deleted by {interaction.user.mention}")
 
+        ticket = tickets.registry.get(interaction.channel.id)
+        if ticket is not None:
+            await tickets.registry.delete(ticket)
         await interaction.channel.delete()
 
 class Tickets(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot: commands.Bot = bot
+        # A reader per transcript worker, since a render holds one for the whole upload, plus two for everything else.
+        self.db = Database("ticket_system.db", readers=settings.TRANSCRIPT_WORKERS + 2)
+        # guild_id -> (admin_role_id, opened_tickets_category_id, closed_tickets_category_id, log_channel_id).
+        # Every row is loaded at startup and written through by setup/reset, so button handlers never hit the database.
+        self.settings: dict[int, tuple] = {}
+        self.registry = TicketRegistry(self.db)
+        self.categories = CategoryPool(self.db)
+        self.capture = BatchWriter(self.db, CAPTURE_MESSAGE)
+        self.transcripts = TranscriptQueue(bot, self.db, self.capture)
+
+    async def cog_load(self):
+        await self.db.open()
+        rows = await self.db.fetchall("SELECT guild_id, admin_role_id, opened_tickets_category_id, closed_tickets_category_id, log_channel_id FROM ticket_settings")
+        self.settings = {row[0]: tuple(row[1:]) for row in rows}
+        await self.registry.load()
+        await self.categories.load()
+        await self.adopt_legacy_tickets()
+        self.capture.start()
+        await self.transcripts.start()
+        self._catch_up_task = asyncio.create_task(self.catch_up_captures())
+        self.sweep_tickets.start()
+
+    async def adopt_legacy_tickets(self):
+        """Register ticket channels from before the tickets table, recognised by their topic."""
+        for guild_id, (_, opened_id, closed_id, _) in self.settings.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            for category_id, status in ((opened_id, "open"), (closed_id, "closed")):
+                category = guild.get_channel(category_id)
+                if category is None:
+                    continue
+                for channel in category.text_channels:
+                    if channel.id in self.registry.by_channel or not channel.topic:
+                        continue
+                    owner_id = channel.topic.split(" ")[0]
+                    if not owner_id.isdigit() or channel.topic != TICKET_TOPIC.format(owner_id):
+                        continue
+                    # Only one open ticket per owner can be indexed; extra legacy ones count as closed.
+                    duplicate = status == "open" and self.registry.open_ticket(guild_id, int(owner_id))
+                    await self.registry.add(guild_id, int(owner_id), channel.id, "closed" if duplicate else status)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if isinstance(channel, discord.CategoryChannel):
+            await self.categories.forget(channel.id)
+            return
+        ticket = self.registry.get(channel.id)
+        if ticket is not None:
+            await self.registry.delete(ticket)
+        if channel.category_id is not None:
+            await self.categories.release(channel.guild, channel.category_id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        if before.category_id is not None and before.category_id != after.category_id:
+            await self.categories.release(after.guild, before.category_id)
+
+    async def cog_unload(self):
+        self.sweep_tickets.cancel()
+        self._catch_up_task.cancel()
+        await self.transcripts.stop()
+        await self.capture.stop()
+        await self.db.close()
+
+    async def catch_up_captures(self):
+        """Capture messages sent to open tickets while the bot was offline.
+
+        Only history newer than the last captured message is read. Tickets that
+        predate capture are skipped; they are rendered from history anyway.
+        """
+        await self.bot.wait_until_ready()
+        rows = await self.db.fetchall(
+            "SELECT t.ticket_id, t.channel_id, MAX(m.message_id) FROM tickets t "
+            "JOIN ticket_messages m ON m.ticket_id = t.ticket_id WHERE t.status = 'open' AND t.captured GROUP BY t.ticket_id"
+        )
+        for ticket_id, channel_id, last_message_id in rows:
+            channel = self.bot.get_channel(channel_id)
+            ticket = self.registry.get(channel_id)
+            if channel is None or ticket is None:
+                continue
+            try:
+                async for message in channel.history(limit=None, after=discord.Object(last_message_id), oldest_first=True):
+                    await self.capture.put(message_row(ticket_id, message))
+                    if not message.author.bot:
+                        ticket.last_activity_at = max(ticket.last_activity_at, to_epoch(message.created_at))
+            except discord.HTTPException as e:
+                log.warning("Could not catch up on ticket %s: %s", ticket_id, e)
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        ticket = self.registry.get(message.channel.id)
+        if ticket is not None:
+            if not message.author.bot:
+                ticket.last_activity_at = now_epoch()
+            await self.capture.put(message_row(ticket.ticket_id, message))
+
+    async def close_ticket(self, guild: discord.Guild, channel: discord.TextChannel, ticket: Ticket, notice: str = "Ticket Closed!", delay: float = 0):
+        """Close ``ticket``: lock the owner out, move it to a closed category and queue its transcript.
+
+        The ticket is only marked closed once the move has succeeded; if it fails
+        the ``HTTPException`` propagates and the ticket stays open.
+        """
+        admin_role_id, _, closed_tickets_category_id, log_channel_id = self.ticket_settings(guild.id)
+        self.registry.closing.add(ticket.channel_id)
+        try:
+            if delay:
+                await channel.send(f"Closing this ticket in {delay:g} seconds...")
+                await asyncio.sleep(delay)
+
+            r1: discord.Role = guild.get_role(admin_role_id)
+            overwrites = {
+                guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                r1: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True),
+                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+            }
+
+            # The category it leaves is released by on_guild_channel_update once the cache has caught up.
+            async with self.categories.allocate(guild, "closed", closed_tickets_category_id) as category:
+                await channel.edit(category=category, overwrites=overwrites)
+            await self.registry.close(ticket)
+        finally:
+            self.registry.closing.discard(ticket.channel_id)
+        await channel.send(embed=discord.Embed(description=notice, color=discord.Color.random()), view=TrashButton())
+
+        log_channel = guild.get_channel(log_channel_id)
+        if log_channel:
+            await self.transcripts.submit(ticket, log_channel_id)
+
+    @tasks.loop(minutes=5)
+    async def sweep_tickets(self):
+        try:
+            await self.close_stale_tickets()
+        except Exception:
+            log.exception("Failed to close stale tickets")
+        try:
+            await self.archive_closed_tickets()
+        except Exception:
+            log.exception("Failed to archive closed tickets")
+
+    @sweep_tickets.before_loop
+    async def before_sweep_tickets(self):
+        await self.bot.wait_until_ready()
+
+    async def close_stale_tickets(self):
+        """Close up to ``SWEEP_BATCH`` open tickets that nobody has written in for ``INACTIVITY_SECONDS``."""
+        if not INACTIVITY_SECONDS:
+            return
+        cutoff = now_epoch() - INACTIVITY_SECONDS
+        stale = [ticket for ticket in self.registry.open_by_owner.values() if ticket.last_activity_at < cutoff]
+        stale.sort(key=lambda ticket: ticket.last_activity_at)
+        hours = f"{settings.TICKET_INACTIVITY_HOURS:g}"
+        for ticket in stale[:SWEEP_BATCH]:
+            guild = self.bot.get_guild(ticket.guild_id)
+            channel = guild.get_channel(ticket.channel_id) if guild else None
+            if channel is None or ticket.channel_id in self.registry.closing or not self.ticket_settings(ticket.guild_id):
+                continue
+            try:
+                await self.close_ticket(guild, channel, ticket, notice=f"🔒 Ticket closed automatically after {hours} hours without activity.")
+            except discord.HTTPException as e:
+                log.warning("Could not close stale ticket %s: %s", ticket.ticket_id, e)
+            await asyncio.sleep(SWEEP_DELAY)
+
+    async def archive_closed_tickets(self):
+        """Delete up to ``SWEEP_BATCH`` tickets closed more than ``RETENTION_SECONDS`` ago.
+
+        A ticket's channel is only deleted once a transcript job for it has
+        succeeded. Tickets closed without one, or whose jobs all failed, get a
+        new job and are deleted on a later sweep; after ``ARCHIVE_MAX_JOBS``
+        failed jobs the channel is kept so the conversation is not lost.
+        """
+        if not RETENTION_SECONDS:
+            return
+        rows = await self.db.fetchall(
+            "SELECT t.ticket_id, t.channel_id, COALESCE(MAX(j.status = 'done'), 0), COALESCE(MAX(j.status = 'pending'), 0) "
+            "FROM tickets t LEFT JOIN transcript_jobs j ON j.ticket_id = t.ticket_id "
+            "WHERE t.status = 'closed' AND t.closed_at < ? "
+            "GROUP BY t.ticket_id HAVING MAX(j.status = 'done') OR COUNT(j.job_id) < ? "
+            "ORDER BY t.closed_at LIMIT ?",
+            (now_epoch() - RETENTION_SECONDS, ARCHIVE_MAX_JOBS, SWEEP_BATCH)
+        )
+        for ticket_id, channel_id, done, pending in rows:
+            ticket = self.registry.get(channel_id)
+            if ticket is None or pending:
+                continue
+            if not done:
+                ticket_settings = self.ticket_settings(ticket.guild_id)
+                await self.transcripts.submit(ticket, ticket_settings[3] if ticket_settings else None)
+                continue
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                await self.registry.delete(ticket)
+                continue
+            try:
+                await channel.delete(reason="Closed ticket past its retention period")
+            except discord.NotFound:
+                await self.registry.delete(ticket)
+            except discord.HTTPException as e:
+                log.warning("Could not delete archived ticket %s: %s", ticket_id, e)
+            await asyncio.sleep(SWEEP_DELAY)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        ticket = self.registry.get(payload.channel_id)
+        if ticket is not None:
+            await self.capture.put(message_row(ticket.ticket_id, payload.message))
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        ticket = self.registry.get(payload.channel_id)
+        if ticket is not None:
+            await self.capture.put(deleted_row(ticket.ticket_id, payload.message_id))
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        ticket = self.registry.get(payload.channel_id)
+        if ticket is not None:
+            await self.capture.put(*(deleted_row(ticket.ticket_id, message_id) for message_id in payload.message_ids))
+
+    def ticket_settings(self, guild_id: int):
+        return self.settings.get(guild_id)
 
     @commands.hybrid_group(name="tickets", description="Ticket management commands", invoke_without_command=True)
     @commands.has_permissions(administrator=True)
@@ -168,8 +784,7 @@ class Tickets(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def setup_tickets(self, ctx: commands.Context, admin_role: discord.Role):
         await ctx.defer()
-        settings = await get_ticket_settings(ctx.guild.id)
-        if settings:
+        if self.ticket_settings(ctx.guild.id):
             await ctx.reply("Ticket system is already set up for this server. Use `/tickets reset-settings` to reset the configuration if needed.", ephemeral=True)
             return
 
@@ -189,12 +804,12 @@ class Tickets(commands.Cog):
         else:
             log_channel = await ctx.guild.create_text_channel("transcripts", overwrites=overwrites)
 
-        async with aiosqlite.connect("ticket_system.db") as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO ticket_settings (guild_id, admin_role_id, opened_tickets_category_id, closed_tickets_category_id, log_channel_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (ctx.guild.id, admin_role.id, open_category.id, closed_category.id, log_channel.id))
-            await db.commit()
+        settings = (admin_role.id, open_category.id, closed_category.id, log_channel.id)
+        await self.db.execute('''
+            INSERT OR REPLACE INTO ticket_settings (guild_id, admin_role_id, opened_tickets_category_id, closed_tickets_category_id, log_channel_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (ctx.guild.id, *settings))
+        self.settings[ctx.guild.id] = settings
 
         embed = discord.Embed(
             title="Success.",
@@ -218,9 +833,9 @@ class Tickets(commands.Cog):
     @tickets_group.command(name="reset-settings", description="Clear the ticket system settings for this server.")
     @commands.has_permissions(administrator=True)
     async def clear_tickets(self, ctx: commands.Context):
-        async with aiosqlite.connect("ticket_system.db") as db:
-            await db.execute('DELETE FROM ticket_settings WHERE guild_id = ?', (ctx.guild.id,))
-            await db.commit()
+        await self.db.execute('DELETE FROM ticket_settings WHERE guild_id = ?', (ctx.guild.id,))
+        self.settings.pop(ctx.guild.id, None)
+        await self.categories.clear(ctx.guild.id)
 
         await ctx.send("Ticket system settings have been cleared for this server.")
 
@@ -6,4 +6,28 @@ load_dotenv()
 TOKEN = os.getenv("TOKEN")
 INTENTS = discord.Intents.all()
 COMMAND_PREFIX = "$"
-STATUS = discord.Status.online
\ No newline at end of file
+STATUS = discord.Status.online
+
+# Economy data is partitioned by guild. Rows created before that have no guild
+# and are migrated to ECONOMY_GUILD_ID, which must be set to the bot's home
+# server before upgrading a database that has any. Setting ECONOMY_DB_PER_GUILD
+# gives every other guild its own SQLite file under economy/.
+ECONOMY_LEGACY_GUILD_ID = int(os.getenv("ECONOMY_GUILD_ID")) if os.getenv("ECONOMY_GUILD_ID") else None
+ECONOMY_DB_PER_GUILD = os.getenv("ECONOMY_DB_PER_GUILD", "").lower() in ("1", "true", "yes")
+
+# Number of ticket transcripts rendered and uploaded at the same time.
+TRANSCRIPT_WORKERS = int(os.getenv("TRANSCRIPT_WORKERS", "2"))
+
+# Where transcripts go: "http" uploads them to TRANSCRIPT_UPLOAD_URL, "local"
+# keeps compressed copies under TRANSCRIPT_DIR. TRANSCRIPT_PUBLIC_URL turns the
+# stored name into a link, e.g. "https://example.com/transcripts/{}".
+TRANSCRIPT_STORAGE = os.getenv("TRANSCRIPT_STORAGE", "http").lower()
+TRANSCRIPT_UPLOAD_URL = os.getenv("TRANSCRIPT_UPLOAD_URL", "https://sheepie.pythonanywhere.com/upload")
+TRANSCRIPT_PUBLIC_URL = os.getenv("TRANSCRIPT_PUBLIC_URL", "")
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "transcripts")
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "gzip").lower()
+
+# Open tickets with no messages for TICKET_INACTIVITY_HOURS are closed, and
+# closed tickets are archived and deleted after TICKET_RETENTION_HOURS. 0 turns either off.
+TICKET_INACTIVITY_HOURS = float(os.getenv("TICKET_INACTIVITY_HOURS", "72"))
+TICKET_RETENTION_HOURS = float(os.getenv("TICKET_RETENTION_HOURS", "168"))
@@ -0,0 +1,178 @@
+import asyncio
+import contextlib
+import logging
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA busy_timeout = 10000",
+)
+
+
+class Database:
+    """Long-lived connections to one SQLite file.
+
+    A single writer connection (guarded by ``write_lock``) plus a small pool of
+    read-only connections. Connections run in autocommit mode, so a lone
+    statement commits on its own and multi-statement work goes through
+    ``transaction()``. Queries are kept as constant strings so sqlite3's
+    per-connection statement cache reuses the prepared statements.
+    """
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self.reader_count = readers
+        self.writer: aiosqlite.Connection | None = None
+        self.write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._connections: list[aiosqlite.Connection] = []
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, timeout=10, isolation_level=None, cached_statements=256)
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        self._connections.append(conn)
+        return conn
+
+    async def open(self):
+        if self.writer is not None:
+            return
+        self.writer = await self._connect()
+        for _ in range(self.reader_count):
+            self._readers.put_nowait(await self._connect(read_only=True))
+
+    async def close(self):
+        async with self.write_lock:
+            for conn in self._connections:
+                await conn.close()
+            self._connections.clear()
+            self._readers = asyncio.Queue()
+            self.writer = None
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        async with self.write_lock:
+            await self.writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.writer
+            except BaseException:
+                await self.writer.execute("ROLLBACK")
+                raise
+            else:
+                await self.writer.execute("COMMIT")
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Run a single write statement and return the affected row count."""
+        async with self.write_lock:
+            cursor = await self.writer.execute(sql, params)
+            rowcount = cursor.rowcount
+            await cursor.close()
+            return rowcount
+
+    async def fetchone(self, sql: str, params=()):
+        async with self.read() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql: str, params=()):
+        async with self.read() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+
+class BatchWriter:
+    """Background writer that group-commits rows for one INSERT statement.
+
+    ``put()`` only waits when the bounded queue is full, which pushes back on
+    producers instead of growing without limit. The worker takes whatever has
+    queued up (at most ``batch_size`` rows) and writes it with a single
+    ``executemany`` transaction. ``flush()`` waits for what is already queued
+    and ``stop()`` drains everything still queued.
+
+    A batch that keeps failing is written one row at a time, so a single bad
+    row cannot take the rest with it; rows that still fail are logged by their
+    first ``key_size`` columns.
+    """
+
+    def __init__(self, db: Database, sql: str, maxsize: int = 1000, batch_size: int = 500, key_size: int = 2):
+        self.db = db
+        self.sql = sql
+        self.batch_size = batch_size
+        self.key_size = key_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+
+    async def put(self, *rows):
+        """Queue ``rows`` to be written together in one transaction."""
+        await self.queue.put(rows)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        """Wait until every row queued so far has been written (or given up on)."""
+        await self.queue.join()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            batch = []
+            taken = 0
+            closing = False
+            item = await self.queue.get()
+            while True:
+                taken += 1
+                if item is None:
+                    closing = True
+                else:
+                    batch.extend(item)
+                if closing or len(batch) >= self.batch_size or self.queue.empty():
+                    break
+                item = self.queue.get_nowait()
+            if batch:
+                await self._write(batch)
+            for _ in range(taken):
+                self.queue.task_done()
+            if closing:
+                return
+
+    async def _write(self, batch: list, attempts: int = 3):
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.db.transaction() as db:
+                    await db.executemany(self.sql, batch)
+                return
+            except Exception:
+                log.exception("Failed to write %s rows to %s (attempt %s/%s)", len(batch), self.db.path, attempt, attempts)
+                if attempt < attempts:
+                    await asyncio.sleep(2 ** attempt)
+        lost = []
+        for row in batch:
+            try:
+                async with self.db.transaction() as db:
+                    await db.execute(self.sql, row)
+            except Exception:
+                lost.append(row[:self.key_size])
+        if lost:
+            log.error("Dropped %s of %s rows for %s: %s", len(lost), len(batch), self.db.path, lost)
@@ -0,0 +1,307 @@
+import aiosqlite
+import settings
+
+# Ordered (version, step) pairs per database file. A step is either an SQL
+# script or an ``async def step(db)`` for changes that need Python. The last
+# applied version lives in the file's ``PRAGMA user_version``, so a database
+# that is already current is opened, checked and closed without running DDL.
+# Never edit a released step; append a new version instead.
+
+MODERATION_MIGRATIONS = [
+    (1, """
+        CREATE TABLE IF NOT EXISTS mutes (
+            guild_id INTEGER,
+            user_id INTEGER,
+            unmute_at TEXT,
+            PRIMARY KEY(guild_id, user_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS mod_actions (
+            action_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            moderator_id INTEGER,
+            action TEXT,
+            reason TEXT,
+            timestamp TEXT
+        );
+    """),
+    (2, """
+        CREATE INDEX IF NOT EXISTS idx_mod_actions_guild_user ON mod_actions (guild_id, user_id, action_id);
+        CREATE INDEX IF NOT EXISTS idx_mutes_unmute_at ON mutes (unmute_at) WHERE unmute_at IS NOT NULL;
+    """),
+    (3, """
+        CREATE INDEX IF NOT EXISTS idx_mod_actions_guild ON mod_actions (guild_id, action_id);
+    """),
+    # Timestamps become integer Unix seconds. The columns were declared TEXT,
+    # which would turn stored integers back into strings, so both tables are rebuilt.
+    (4, """
+        ALTER TABLE mutes RENAME TO mutes_old;
+        CREATE TABLE mutes (
+            guild_id INTEGER,
+            user_id INTEGER,
+            unmute_at INTEGER,
+            PRIMARY KEY(guild_id, user_id)
+        );
+        INSERT INTO mutes (guild_id, user_id, unmute_at)
+            SELECT guild_id, user_id, CAST(strftime('%s', unmute_at) AS INTEGER) FROM mutes_old;
+        DROP TABLE mutes_old;
+        CREATE INDEX idx_mutes_unmute_at ON mutes (unmute_at) WHERE unmute_at IS NOT NULL;
+
+        ALTER TABLE mod_actions RENAME TO mod_actions_old;
+        CREATE TABLE mod_actions (
+            action_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            moderator_id INTEGER,
+            action TEXT,
+            reason TEXT,
+            timestamp INTEGER
+        );
+        INSERT INTO mod_actions (action_id, guild_id, user_id, moderator_id, action, reason, timestamp)
+            SELECT action_id, guild_id, user_id, moderator_id, action, reason, CAST(strftime('%s', timestamp) AS INTEGER)
+            FROM mod_actions_old;
+        DROP TABLE mod_actions_old;
+        CREATE INDEX idx_mod_actions_guild_user ON mod_actions (guild_id, user_id, action_id);
+        CREATE INDEX idx_mod_actions_guild ON mod_actions (guild_id, action_id);
+        CREATE INDEX idx_mod_actions_guild_time ON mod_actions (guild_id, timestamp);
+    """),
+]
+
+TICKET_MIGRATIONS = [
+    (1, """
+        CREATE TABLE IF NOT EXISTS ticket_settings (
+            guild_id INTEGER PRIMARY KEY,
+            admin_role_id INTEGER NOT NULL,
+            opened_tickets_category_id INTEGER NOT NULL,
+            closed_tickets_category_id INTEGER NOT NULL,
+            log_channel_id INTEGER NOT NULL
+        );
+    """),
+    (2, """
+        CREATE TABLE IF NOT EXISTS tickets (
+            ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'open',
+            opened_at INTEGER NOT NULL,
+            closed_at INTEGER
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_open_owner ON tickets (guild_id, owner_id) WHERE status = 'open';
+        CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status);
+    """),
+    (3, """
+        CREATE TABLE IF NOT EXISTS transcript_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            log_channel_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            url TEXT,
+            last_error TEXT,
+            created_at INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transcript_jobs_pending ON transcript_jobs (next_attempt_at) WHERE status = 'pending';
+    """),
+    (4, """
+        CREATE TABLE IF NOT EXISTS ticket_messages (
+            ticket_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            author_id INTEGER,
+            author_name TEXT,
+            content TEXT,
+            attachments TEXT,
+            embeds TEXT,
+            created_at INTEGER,
+            edited_at INTEGER,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ticket_id, message_id)
+        ) WITHOUT ROWID;
+    """),
+    (5, """
+        CREATE TABLE IF NOT EXISTS ticket_categories (
+            category_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            kind TEXT NOT NULL
+        );
+    """),
+    (6, """
+        CREATE INDEX IF NOT EXISTS idx_tickets_closed_at ON tickets (closed_at) WHERE status = 'closed';
+        CREATE INDEX IF NOT EXISTS idx_transcript_jobs_ticket ON transcript_jobs (ticket_id);
+    """),
+    # NULL for messages captured before this column existed.
+    (7, "ALTER TABLE ticket_messages ADD COLUMN bot INTEGER"),
+    # Whether every message of the ticket was captured from the start. Existing
+    # tickets can't be known to be complete, so they keep exporting channel history.
+    (8, "ALTER TABLE tickets ADD COLUMN captured INTEGER NOT NULL DEFAULT 0"),
+]
+
+ECONOMY_GUILD_TABLES = {
+    "users": ("""
+        CREATE TABLE users (
+            guild_id INTEGER,
+            user_id INTEGER,
+            balance INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """, "user_id, balance"),
+    "jobs": ("""
+        CREATE TABLE jobs (
+            guild_id INTEGER,
+            name TEXT,
+            payout_min INTEGER,
+            payout_max INTEGER,
+            PRIMARY KEY (guild_id, name)
+        )
+    """, "name, payout_min, payout_max"),
+    "items": ("""
+        CREATE TABLE items (
+            guild_id INTEGER,
+            name TEXT,
+            price INTEGER,
+            PRIMARY KEY (guild_id, name)
+        )
+    """, "name, price"),
+    "inventory": ("""
+        CREATE TABLE inventory (
+            guild_id INTEGER,
+            user_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            PRIMARY KEY (guild_id, user_id, item_name)
+        )
+    """, "user_id, item_name, quantity"),
+    "robberies": ("""
+        CREATE TABLE robberies (
+            guild_id INTEGER,
+            name TEXT,
+            success_chance REAL,
+            reward_min INTEGER,
+            reward_max INTEGER,
+            PRIMARY KEY (guild_id, name)
+        )
+    """, "name, success_chance, reward_min, reward_max"),
+    "role_income": ("""
+        CREATE TABLE role_income (
+            guild_id INTEGER,
+            role_id INTEGER,
+            income_amount INTEGER,
+            PRIMARY KEY (guild_id, role_id)
+        )
+    """, "role_id, income_amount"),
+    "last_claims": ("""
+        CREATE TABLE last_claims (
+            guild_id INTEGER,
+            user_id INTEGER,
+            last_claim TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """, "user_id, last_claim"),
+}
+
+
+async def _partition_economy_by_guild(db: aiosqlite.Connection):
+    """Key every economy table by guild. Existing rows move to ECONOMY_GUILD_ID."""
+    if settings.ECONOMY_LEGACY_GUILD_ID is None:
+        for table in ECONOMY_GUILD_TABLES:
+            async with db.execute(f"SELECT EXISTS (SELECT 1 FROM {table})") as cursor:
+                if (await cursor.fetchone())[0]:
+                    raise RuntimeError(
+                        f"economy table {table} has rows from before per-guild economies; "
+                        "set ECONOMY_GUILD_ID to the guild they belong to and restart"
+                    )
+    for table, (create, columns) in ECONOMY_GUILD_TABLES.items():
+        await db.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        await db.execute(create)
+        await db.execute(
+            f"INSERT INTO {table} (guild_id, {columns}) SELECT ?, {columns} FROM {table}_old",
+            (settings.ECONOMY_LEGACY_GUILD_ID,)
+        )
+        await db.execute(f"DROP TABLE {table}_old")
+    await db.execute("CREATE INDEX idx_users_balance ON users (guild_id, balance DESC, user_id DESC)")
+
+
+ECONOMY_MIGRATIONS = [
+    (1, """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS jobs (
+            name TEXT PRIMARY KEY,
+            payout_min INTEGER,
+            payout_max INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS items (
+            name TEXT PRIMARY KEY,
+            price INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS inventory (
+            user_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            PRIMARY KEY (user_id, item_name)
+        );
+
+        CREATE TABLE IF NOT EXISTS robberies (
+            name TEXT PRIMARY KEY,
+            success_chance REAL,
+            reward_min INTEGER,
+            reward_max INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS role_income (
+            role_id INTEGER PRIMARY KEY,
+            income_amount INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS last_claims (
+            user_id INTEGER PRIMARY KEY,
+            last_claim TIMESTAMP
+        );
+    """),
+    (2, """
+        CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance DESC, user_id DESC);
+    """),
+    (3, _partition_economy_by_guild),
+    # last_claim has NUMERIC affinity, so integers are stored as-is and no rebuild is needed.
+    (4, """
+        UPDATE last_claims SET last_claim = CAST(strftime('%s', last_claim) AS INTEGER)
+        WHERE typeof(last_claim) = 'text';
+    """),
+]
+
+
+async def get_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(path: str, migrations: list):
+    """Apply every migration newer than the file's schema version, each in its own transaction."""
+    async with aiosqlite.connect(path, isolation_level=None) as db:
+        current = await get_version(db)
+        for version, step in migrations:
+            if version <= current:
+                continue
+            try:
+                if callable(step):
+                    await db.execute("BEGIN IMMEDIATE")
+                    await step(db)
+                    await db.execute(f"PRAGMA user_version = {version}")
+                    await db.execute("COMMIT")
+                else:
+                    await db.executescript(f"BEGIN IMMEDIATE; {step}; PRAGMA user_version = {version}; COMMIT;")
+            except BaseException:
+                if db.in_transaction:
+                    await db.execute("ROLLBACK")
+                raise
+            print(f"Migrated {path} to schema version {version}")
@@ -0,0 +1,108 @@
+import abc
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import aiohttp
+import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+
+class TranscriptStore(abc.ABC):
+    """Somewhere to keep rendered ticket transcripts.
+
+    ``save()`` consumes an async iterator of HTML byte chunks as it arrives, so
+    a transcript is never held in memory in full, and returns a locator for
+    the stored copy: a URL when there is one, otherwise a path.
+    """
+
+    @abc.abstractmethod
+    async def save(self, name: str, chunks) -> str:
+        ...
+
+
+class LocalTranscriptStore(TranscriptStore):
+    """Compressed, content-addressed files under ``root``.
+
+    Each transcript is stored as ``<root>/<ab>/<sha256>.html.gz`` (or
+    ``.html.zst``), keyed by the hash of its uncompressed HTML, so saving the
+    same transcript twice keeps one file. ``public_url`` is a format string for
+    the path relative to ``root`` if the directory is served over HTTP.
+    """
+
+    def __init__(self, root: str, compression: str = "gzip", public_url: str = None):
+        if compression == "zstd" and zstandard is None:
+            log.warning("zstandard is not installed; storing transcripts with gzip instead")
+            compression = "gzip"
+        self.root = root
+        self.compression = compression
+        self.suffix = ".html.zst" if compression == "zstd" else ".html.gz"
+        self.public_url = public_url
+        os.makedirs(root, exist_ok=True)
+
+    def _compressor(self, raw):
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+        # mtime=0 keeps the output identical for identical input.
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+
+    async def save(self, name: str, chunks) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                compressor = self._compressor(raw)
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await asyncio.to_thread(compressor.write, chunk)
+                await asyncio.to_thread(compressor.close)
+            key = digest.hexdigest()
+            relative = f"{key[:2]}/{key}{self.suffix}"
+            path = os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.public_url.format(relative) if self.public_url else path
+
+
+class HttpTranscriptStore(TranscriptStore):
+    """Multipart upload of the transcript to ``upload_url``.
+
+    The body is sent with chunked transfer encoding straight from the chunk
+    iterator. ``public_url`` is formatted with the file name to give the link.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, upload_url: str, public_url: str):
+        self.session = session
+        self.upload_url = upload_url
+        self.public_url = public_url
+
+    async def save(self, name: str, chunks) -> str:
+        form_data = aiohttp.FormData()
+        form_data.add_field('file', chunks, filename=name, content_type='text/html')
+        async with self.session.post(self.upload_url, data=form_data) as response:
+            if response.status != 200:
+                raise RuntimeError(f"upload failed with status {response.status}: {(await response.text())[:200]}")
+        return self.public_url.format(name)
+
+
+def transcript_store(session: aiohttp.ClientSession) -> TranscriptStore:
+    """The store selected by ``settings.TRANSCRIPT_STORAGE``."""
+    if settings.TRANSCRIPT_STORAGE == "local":
+        return LocalTranscriptStore(settings.TRANSCRIPT_DIR, settings.TRANSCRIPT_COMPRESSION, settings.TRANSCRIPT_PUBLIC_URL or None)
+    return HttpTranscriptStore(
+        session,
+        settings.TRANSCRIPT_UPLOAD_URL,
+        settings.TRANSCRIPT_PUBLIC_URL or "https://sheepie.pythonanywhere.com/uploads/{}"
+    )
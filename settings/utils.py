@@ -1,83 +1,53 @@
-import aiosqlite
+import asyncio
+import contextlib
+import time
+from datetime import datetime, timezone
+from settings.migrations import migrate, MODERATION_MIGRATIONS, TICKET_MIGRATIONS, ECONOMY_MIGRATIONS
 
 async def init_moderation_db():
-    async with aiosqlite.connect("moderation.db") as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS mutes (
-                guild_id INTEGER,
-                user_id INTEGER,
-                unmute_at TEXT,
-                PRIMARY KEY(guild_id, user_id)
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS mod_actions (
-                action_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER,
-                user_id INTEGER,
-                moderator_id INTEGER,
-                action TEXT,
-                reason TEXT,
-                timestamp TEXT
-            )
-        """)
-        await db.commit()
+    await migrate("moderation.db", MODERATION_MIGRATIONS)
 
 
 async def init_ticket_db():
-    async with aiosqlite.connect("ticket_system.db") as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS ticket_settings (
-                guild_id INTEGER PRIMARY KEY,
-                admin_role_id INTEGER NOT NULL,
-                opened_tickets_category_id INTEGER NOT NULL,
-                closed_tickets_category_id INTEGER NOT NULL,
-                log_channel_id INTEGER NOT NULL
-            )
-        ''')
-        await db.commit()
+    await migrate("ticket_system.db", TICKET_MIGRATIONS)
 
 async def init_economy_db():
-    async with aiosqlite.connect("economy.db") as db:
-        await db.executescript("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            balance INTEGER DEFAULT 0
-        );
+    await migrate("economy.db", ECONOMY_MIGRATIONS)
 
-        CREATE TABLE IF NOT EXISTS jobs (
-            name TEXT PRIMARY KEY,
-            payout_min INTEGER,
-            payout_max INTEGER
-        );
 
-        CREATE TABLE IF NOT EXISTS items (
-            name TEXT PRIMARY KEY,
-            price INTEGER
-        );
+def now_epoch() -> int:
+    """The current time in whole Unix seconds, the format of every timestamp column."""
+    return int(time.time())
 
-        CREATE TABLE IF NOT EXISTS inventory (
-            user_id INTEGER,
-            item_name TEXT,
-            quantity INTEGER,
-            PRIMARY KEY (user_id, item_name)
-        );
+def to_epoch(dt: datetime) -> int:
+    """``dt`` in whole Unix seconds. Naive datetimes are taken to be UTC."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
 
-        CREATE TABLE IF NOT EXISTS robberies (
-            name TEXT PRIMARY KEY,
-            success_chance REAL,
-            reward_min INTEGER,
-            reward_max INTEGER
-        );
 
-        CREATE TABLE IF NOT EXISTS role_income (
-            role_id INTEGER PRIMARY KEY,
-            income_amount INTEGER
-        );
+class KeyedLock:
+    """A fixed pool of asyncio locks striped by key.
 
-        CREATE TABLE IF NOT EXISTS last_claims (
-            user_id INTEGER PRIMARY KEY,
-            last_claim TIMESTAMP
-        );
-        """)
-        await db.commit()
\ No newline at end of file
+    ``async with locks(a, b):`` acquires the stripes for every key in a stable
+    order, so two commands touching the same pair of keys can't deadlock and
+    commands on unrelated keys rarely wait on each other.
+    """
+
+    def __init__(self, stripes: int = 128):
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+
+    def __call__(self, *keys):
+        return self._acquire(sorted({hash(key) % len(self._locks) for key in keys}))
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self, stripes):
+        acquired = []
+        try:
+            for stripe in stripes:
+                await self._locks[stripe].acquire()
+                acquired.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(acquired):
+                self._locks[stripe].release()
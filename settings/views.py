@@ -0,0 +1,59 @@
+import discord
+from discord.ui import Button, button, View
+
+
+class Paginator(View):
+    """Previous/Next pages of rows that only the user who asked can flip.
+
+    ``fetch(page, previous)`` loads page ``page`` (0-based) given the rows of the
+    page before it, or ``None`` for the first, and returns up to ``page_size + 1``
+    rows; the extra row only tells the paginator there is another page.
+    ``render(rows, page)`` builds the embed for a page. Pages are fetched the
+    first time they are shown and kept, so going back never fetches again.
+    """
+
+    def __init__(self, author_id: int, page_size: int, fetch, render, timeout: float = 180, labels: tuple = ("Previous", "Next")):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.page_size = page_size
+        self.fetch = fetch
+        self.render = render
+        self.pages: list[list] = []
+        self.has_more = True
+        self.page = 0
+        self.previous.label, self.next.label = labels
+
+    async def start(self) -> "Paginator":
+        """Fetch the first page. Returns the paginator so it can be sent straight away."""
+        await self._fetch_next()
+        self._update_buttons()
+        return self
+
+    async def _fetch_next(self):
+        rows = await self.fetch(len(self.pages), self.pages[-1] if self.pages else None)
+        self.has_more = len(rows) > self.page_size
+        self.pages.append(rows[:self.page_size])
+
+    def embed(self) -> discord.Embed:
+        return self.render(self.pages[self.page], self.page)
+
+    def _update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page == len(self.pages) - 1 and not self.has_more
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    @button(label="Previous", style=discord.ButtonStyle.gray, emoji="◀️")
+    async def previous(self, interaction: discord.Interaction, button: Button):
+        self.page -= 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @button(label="Next", style=discord.ButtonStyle.gray, emoji="▶️")
+    async def next(self, interaction: discord.Interaction, button: Button):
+        if self.page == len(self.pages) - 1:
+            await self._fetch_next()
+        self.page += 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)